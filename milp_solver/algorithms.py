@@ -115,8 +115,12 @@
 
 
 # algorithms.py
+import time
 from inputs import Input
+from encoding import Encoding
 from pareto_points import Pareto_Points
+from enumerators import enumerate_front
+from benchmark_table import write_benchmark
 
 EPS = 1e-6
 
@@ -169,6 +173,230 @@ def Non_Trivial_tau(inp: Input, fixed_int_pos=None):
     return 1, fixed_int_pos
 
 
+def compare_build_modes(dir_name, max_nodes, root=0, e_l=None, e_u=None, c_l=None, c_u=None, presolve=False, formulation="standard"):
+    '''
+    builds the encoding of the all-integer model once with the loop builder and once with the matrix builder (Encoding.build_mode)
+    and checks that both have the same number of variables, constraints and nonzeros and the same optimal objective in the given box
+    returns {build_mode: {"vars", "constrs", "nonzeros", "build_time", "obj"}}
+    '''
+    inp = Input(dir_name, max_nodes)
+    int_nodes = set(range(max_nodes))
+    stats = {}
+    for build_mode in ("loop", "matrix"):
+        enc = Encoding(int_nodes, int_nodes, set(), set(), inp, root, build_mode=build_mode, presolve=presolve, formulation=formulation)
+        start = time.perf_counter()
+        enc._build_constraints()
+        enc.model.update()
+        build_time = time.perf_counter() - start
+        res = enc.solve(e_l, e_u, c_l, c_u)
+        stats[build_mode] = {
+            "vars": enc.model.NumVars,
+            "constrs": enc.model.NumConstrs,
+            "nonzeros": enc.model.NumNZs,
+            "build_time": build_time,
+            "obj": res["obj"],
+        }
+    loop, matrix = stats["loop"], stats["matrix"]
+    for key in ("vars", "constrs", "nonzeros"):
+        assert loop[key] == matrix[key], f"{key} differ: loop={loop[key]}, matrix={matrix[key]}"
+    assert (loop["obj"] is None) == (matrix["obj"] is None) and (loop["obj"] is None or abs(loop["obj"] - matrix["obj"]) <= EPS), \
+        f"optimal objectives differ: loop={loop['obj']}, matrix={matrix['obj']}"
+    print(f"build time: loop {loop['build_time']:.2f} s, matrix {matrix['build_time']:.2f} s")
+    return stats
+
+
+def compare_formulations(dir_name, max_nodes, root=0, formulations=("standard", "compact"), **encoding_options):
+    '''
+    computes the Pareto front of the all-integer model (lam and tau integral at every node) with every formulation in formulations
+    and checks that the fronts are the same
+    encoding_options are passed on to Pareto_Points (build_mode, presolve)
+    returns {formulation: {"points", "vars", "constrs", "time"}}
+    '''
+    int_nodes = set(range(max_nodes))
+    stats = {}
+    for formulation in formulations:
+        start = time.perf_counter()
+        pp = Pareto_Points(dir_name, max_nodes, int_nodes, int_nodes, set(), set(), root, formulation=formulation, **encoding_options)
+        pp.find_pareto_points(None, None, None, None)
+        pp.clean_pareto_points()
+        stats[formulation] = {
+            "points": [(c, e) for c, e, _ in pp.pareto_points],
+            "vars": pp.enc.model.NumVars,
+            "constrs": pp.enc.model.NumConstrs,
+            "time": time.perf_counter() - start,
+        }
+    reference = formulations[0]
+    for formulation in formulations[1:]:
+        a, b = stats[reference]["points"], stats[formulation]["points"]
+        # u is continuous here, so e is only exact up to the solver tolerances
+        assert len(a) == len(b) and all(abs(ca - cb) <= EPS and abs(ea - eb) <= 1e-3 for (ca, ea), (cb, eb) in zip(a, b)), \
+            f"Pareto fronts differ: {reference}={a}, {formulation}={b}"
+    for formulation in formulations:
+        print(f"{formulation}: {stats[formulation]['vars']} variables, {stats[formulation]['constrs']} constraints, {stats[formulation]['time']:.2f} s")
+    return stats
+
+
+def benchmark_formulations(dir_name, max_nodes, root=0, formulations=("standard", "compact", "flow"), **encoding_options):
+    '''
+    compares the formulations of Encoding on one instance:
+        - size of the model
+        - the bound of the LP relaxation (everything continuous, no box) - the smaller the stronger the formulation
+        - the all-integer Pareto front, its running time, number of MILP calls and branch and bound nodes
+    the compact formulation is skipped if the buckets are not a partition
+    results are written to examples/<instance>/results/benchmarks/formulations_I<max_nodes>.csv
+    '''
+    inp = Input(dir_name, max_nodes)
+    int_nodes = set(range(max_nodes))
+    rows = []
+    for formulation in formulations:
+        if formulation == "compact" and not inp.buckets_validated:
+            print("skipping the compact formulation, the buckets are not a partition")
+            continue
+        relaxed = Encoding(set(), set(), set(), set(), inp, root, formulation=formulation, **encoding_options)
+        res = relaxed.solve(None, None, None, None)
+        start = time.perf_counter()
+        pp = Pareto_Points(dir_name, max_nodes, int_nodes, int_nodes, set(), set(), root, formulation=formulation, **encoding_options)
+        pp.find_pareto_points(None, None, None, None)
+        pp.clean_pareto_points()
+        rows.append({
+            "formulation": formulation,
+            "vars": pp.enc.model.NumVars,
+            "constrs": pp.enc.model.NumConstrs,
+            "lp_bound": res["obj"],
+            "points": len(pp.pareto_points),
+            "time": round(time.perf_counter() - start, 3),
+            "solve_time": round(pp.solve_time, 3),
+            "overhead": round(pp.overhead_time, 4),
+            "milp_calls": pp.milp_calls,
+            "nodes": pp.node_count,
+        })
+    write_benchmark(dir_name, f"formulations_I{max_nodes}.csv", rows)
+    return rows
+
+
+def benchmark_symmetry_breaking(dir_name, max_nodes_list=(5, 6, 7), root=0, **encoding_options):
+    '''
+    all-integer Pareto front (lam, tau, u and m integral at every internal node) with and without Encoding(symmetry_breaking=True)
+    for every number of internal nodes in max_nodes_list, reports the wall time, the gurobi run time and the branch and bound nodes
+    results are written to examples/<instance>/results/benchmarks/symmetry_breaking.csv
+    '''
+    rows = []
+    for max_nodes in max_nodes_list:
+        int_nodes = set(range(max_nodes))
+        fronts = {}
+        for symmetry_breaking in (False, True):
+            start = time.perf_counter()
+            pp = Pareto_Points(dir_name, max_nodes, int_nodes, int_nodes, int_nodes, int_nodes, root, symmetry_breaking=symmetry_breaking, **encoding_options)
+            pp.find_pareto_points(None, None, None, None)
+            pp.clean_pareto_points()
+            fronts[symmetry_breaking] = [(c, e) for c, e, _ in pp.pareto_points]
+            rows.append({
+                "I": max_nodes,
+                "symmetry_breaking": symmetry_breaking,
+                "points": len(pp.pareto_points),
+                "time": round(time.perf_counter() - start, 3),
+                "solve_time": round(pp.solve_time, 3),
+                "overhead": round(pp.overhead_time, 4),
+                "milp_calls": pp.milp_calls,
+                "nodes": pp.node_count,
+            })
+        assert fronts[False] == fronts[True], f"I={max_nodes}: symmetry breaking changed the front {fronts[False]} -> {fronts[True]}"
+    write_benchmark(dir_name, "symmetry_breaking.csv", rows)
+    return rows
+
+
+def benchmark_warm_start(dir_name, max_nodes, root=0, **encoding_options):
+    '''
+    all-integer Pareto front with and without MIP starts (Pareto_Points(warm_start=True)), reports the accepted starts and the gurobi run time
+    results are written to examples/<instance>/results/benchmarks/warm_start_I<max_nodes>.csv
+    '''
+    int_nodes = set(range(max_nodes))
+    rows = []
+    fronts = {}
+    for warm_start in (False, True):
+        start = time.perf_counter()
+        pp = Pareto_Points(dir_name, max_nodes, int_nodes, int_nodes, set(), set(), root, warm_start=warm_start, **encoding_options)
+        pp.find_pareto_points(None, None, None, None)
+        pp.clean_pareto_points()
+        fronts[warm_start] = [(c, e) for c, e, _ in pp.pareto_points]
+        ws = pp.warm_start
+        rows.append({
+            "warm_start": warm_start,
+            "points": len(pp.pareto_points),
+            "time": round(time.perf_counter() - start, 3),
+            "solve_time": round(pp.solve_time, 3),
+            "milp_calls": pp.milp_calls,
+            "nodes": pp.node_count,
+            "full_starts": f"{ws.accepted['full']}/{ws.given['full']}" if ws else "",
+            "partial_starts": f"{ws.accepted['partial']}/{ws.given['partial']}" if ws else "",
+        })
+    assert fronts[False] == fronts[True], f"warm starting changed the front {fronts[False]} -> {fronts[True]}"
+    saved = rows[0]["solve_time"] - rows[1]["solve_time"]
+    write_benchmark(dir_name, f"warm_start_I{max_nodes}.csv", rows)
+    print(f"solve time saved by the MIP starts: {saved:.3f} s")
+    return rows
+
+
+def benchmark_solution_pool(dir_name, max_nodes, root=0, pool_solutions=20, pool_search_mode=2, **encoding_options):
+    '''
+    all-integer Pareto front with and without harvesting the solution pool (Pareto_Points(pool_solutions=...)),
+    reports the MILP calls per front and the boxes closed by a pool candidate
+    results are written to examples/<instance>/results/benchmarks/solution_pool_I<max_nodes>.csv
+    '''
+    int_nodes = set(range(max_nodes))
+    rows = []
+    fronts = {}
+    for use_pool in (False, True):
+        pool_options = {"pool_solutions": pool_solutions, "pool_search_mode": pool_search_mode} if use_pool else {}
+        start = time.perf_counter()
+        pp = Pareto_Points(dir_name, max_nodes, int_nodes, int_nodes, set(), set(), root, **pool_options, **encoding_options)
+        pp.find_pareto_points(None, None, None, None)
+        pp.clean_pareto_points()
+        fronts[use_pool] = [(c, e) for c, e, _ in pp.pareto_points]
+        rows.append({
+            "pool": f"{pool_solutions}/mode {pool_search_mode}" if use_pool else "",
+            "points": len(pp.pareto_points),
+            "time": round(time.perf_counter() - start, 3),
+            "solve_time": round(pp.solve_time, 3),
+            "milp_calls": pp.milp_calls,
+            "closed_by_pool": pp.saved_calls,
+            "candidates": len(pp.candidates),
+        })
+    assert fronts[False] == fronts[True], f"the solution pool changed the front {fronts[False]} -> {fronts[True]}"
+    write_benchmark(dir_name, f"solution_pool_I{max_nodes}.csv", rows)
+    print(f"MILP calls saved by the solution pool: {rows[0]['milp_calls'] - rows[1]['milp_calls']}")
+    return rows
+
+
+def compare_enumerators(dir_name, max_nodes, root=0, methods=("divide_and_conquer", "epsilon_constraint", "balanced_box", "two_phase"), **encoding_options):
+    '''
+    all-integer Pareto front with every enumerator (see enumerators.py), reports the MILP calls (and how many ended infeasible)
+    results are written to examples/<instance>/results/benchmarks/enumerators_I<max_nodes>.csv
+    '''
+    int_nodes = set(range(max_nodes))
+    rows = []
+    fronts = {}
+    for method in methods:
+        start = time.perf_counter()
+        pp = Pareto_Points(dir_name, max_nodes, int_nodes, int_nodes, set(), set(), root, **encoding_options)
+        enumerate_front(pp, method)
+        pp.clean_pareto_points()
+        fronts[method] = [(c, e) for c, e, _ in pp.pareto_points]
+        rows.append({
+            "method": method,
+            "points": len(pp.pareto_points),
+            "time": round(time.perf_counter() - start, 3),
+            "solve_time": round(pp.solve_time, 3),
+            "milp_calls": pp.milp_calls,
+            "infeasible_calls": pp.infeasible_calls,
+            "skipped_boxes": pp.skipped_boxes,
+        })
+    for method in methods[1:]:
+        assert fronts[method] == fronts[methods[0]], f"{method} found {fronts[method]}, {methods[0]} found {fronts[methods[0]]}"
+    write_benchmark(dir_name, f"enumerators_I{max_nodes}.csv", rows)
+    return rows
+
+
 def main():
     inp = Input("examples/wine", max_nodes=4)
     k, used = Non_Trivial_tau(inp)
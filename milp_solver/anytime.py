@@ -0,0 +1,87 @@
+import os
+import csv
+
+'''
+Quality of a front found within a time budget (Pareto_Points.cumulate_pareto_points(time_budget=...)).
+
+Every Pareto point of the instance is either found, or lies in one of pp.open_boxes: the boxes that were not
+solved in time, or whose solve stopped before proving the optimum. A box is closed by the bound of its solve,
+w_e*e + w_c*N*c <= obj_bound (the objective weights of that solve), and by e <= MAX_EXPLANATION, c <= 1.
+So the largest e reachable at correctness c or more is at most
+    e_upper(c) = max(e of the found points with c' >= c, e reachable in an open box with c' >= c)
+which is the certified upper bound curve; e_found(c) is the same over the found points only.
+Both are step functions over the correctness levels c = k/N, k = 1..N, the discrete hypervolume of a curve is
+sum over k of max(0, e(k/N) - E_REF), i.e. the number of (c step, unit of e) cells below it.
+hv_upper - hv_found shrinks to 0 when the front is proven complete.
+'''
+
+E_REF = 0.0 # reference explainability of the hypervolume
+
+
+def open_box_cap(box, c, enc):
+    '''
+    returns the largest e of a point of the open box with correctness >= c (None if there is no such point)
+    '''
+    e_l, e_u, c_l, c_u, bound, (w_e, w_c) = box
+    lo_c = c if c_l is None else max(c, c_l)
+    hi_c = 1.0 if c_u is None else c_u
+    if lo_c > hi_c + 1e-9:
+        return None
+    cap = enc.MAX_EXPLANATION if e_u is None else e_u
+    if bound is not None:
+        # w_e*e + w_c*N*c' <= bound is loosest at the smallest c'
+        cap = min(cap, (bound - w_c*enc.N_SAMPLES*lo_c) / w_e)
+    if e_l is not None and cap < e_l:
+        return None
+    return cap
+
+
+def anytime_curves(pp):
+    '''
+    returns [(c, e_found, e_upper)] for c = 1/N, 2/N, ..., 1 (None = nothing with correctness >= c)
+    '''
+    N = pp.enc.N_SAMPLES
+    rows = []
+    for k in range(1, N + 1):
+        c = k / N
+        found = [e for c_p, e, _ in pp.pareto_points if c_p >= c - 1e-9]
+        e_found = max(found) if found else None
+        caps = [cap for cap in (open_box_cap(box, c, pp.enc) for box in pp.open_boxes) if cap is not None]
+        e_upper = max([e for e in (e_found, *caps) if e is not None], default=None)
+        rows.append((c, e_found, e_upper))
+    return rows
+
+
+def hypervolume(values):
+    return sum(max(0.0, e - E_REF) for e in values if e is not None)
+
+
+def write_anytime_report(pp):
+    '''
+    writes the points with their MIP gap and the curves, returns {"hv_found", "hv_upper", "hv_gap", "hv_gap_rel"}
+    '''
+    rows = anytime_curves(pp)
+    hv_found = hypervolume(e for _, e, _ in rows)
+    hv_upper = hypervolume(e for _, _, e in rows)
+    summary = {
+        "hv_found": hv_found,
+        "hv_upper": hv_upper,
+        "hv_gap": hv_upper - hv_found,
+        "hv_gap_rel": (hv_upper - hv_found) / hv_upper if hv_upper > 0 else 0.0,
+    }
+    out_dir = os.path.join(pp.inp.filename, "results", f"I_{pp.enc.inp.max_nodes}_int_nodes_{pp.enc._int_tag}", "pareto_points")
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, f"anytime_points_I{pp.inp.max_nodes}_C{pp.inp.c_max}.csv"), "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["c", "e", "mip_gap"])
+        for c, e, _ in pp.pareto_points:
+            w.writerow([c, e, pp.point_gaps.get((c, e), "")])
+    with open(os.path.join(out_dir, f"anytime_curves_I{pp.inp.max_nodes}_C{pp.inp.c_max}.csv"), "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["c", "e_found", "e_upper"])
+        w.writerows(rows)
+        w.writerow([])
+        for key, value in summary.items():
+            w.writerow([key, value])
+    print(f"anytime front: {len(pp.pareto_points)} points, {len(pp.open_boxes)} open boxes, hypervolume {hv_found} of at most {hv_upper}")
+    return summary
@@ -0,0 +1,142 @@
+import bisect
+
+from box_queue import contains
+
+'''
+What the Pareto search already knows about the (c, e) plane, used to skip or shrink boxes before they are solved.
+
+Pareto_Archive - the non-dominated points found so far (online: a new point removes the points it dominates)
+Infeasible_Memo - the boxes proven to be empty (the solve ended in GRB.INFEASIBLE)
+tighten_box() cuts off the parts of a box that lie inside a proven-empty box or are dominated by an archive point,
+e in steps of 1 and c in steps of c_step (one sample), like the split of the divide and conquer.
+NOTE: the plain divide and conquer never issues a box overlapping an empty box, and a box is dominated only next to
+a point with c = 1 (c <= 1 closes the open c side). Both pay off when boxes are issued differently (other enumerators, resumed runs)
+'''
+
+
+class Pareto_Archive:
+    '''
+    Instance attributes:
+        points(list) - the non-dominated (c, e), sorted by increasing c (so by decreasing e)
+    '''
+    def __init__(self):
+        self.points = []
+
+    def dominates(self, c, e):
+        '''
+        True if an archive point weakly dominates (c, e) (c' >= c and e' >= e)
+        '''
+        k = bisect.bisect_left(self.points, (c, float("-inf")))
+        # the points from k on have c' >= c, the first of them has the largest e
+        return k < len(self.points) and self.points[k][1] >= e
+
+    def add(self, c, e):
+        '''
+        adds (c, e) unless it is weakly dominated, removes the points it dominates, returns whether it was added
+        '''
+        if self.dominates(c, e):
+            return False
+        k = bisect.bisect_left(self.points, (c, e))
+        # the dominated points (c' <= c, e' <= e) are just before k
+        first = k
+        while first > 0 and self.points[first - 1][1] <= e:
+            first -= 1
+        self.points[first:k] = [(c, e)]
+        return True
+
+    def best_e(self, c):
+        '''
+        returns the largest e of an archive point with c' >= c (None if there is none)
+        '''
+        k = bisect.bisect_left(self.points, (c, float("-inf")))
+        return self.points[k][1] if k < len(self.points) else None
+
+    def best_c(self, e):
+        '''
+        returns the largest c of an archive point with e' >= e (None if there is none)
+        '''
+        best = None
+        for c_p, e_p in self.points:
+            if e_p >= e:
+                best = c_p
+            else:
+                break
+        return best
+
+    def __len__(self):
+        return len(self.points)
+
+
+class Infeasible_Memo:
+    '''
+    Instance attributes:
+        boxes(list) - the proven-empty boxes (e_l, e_u, c_l, c_u), None = open side
+    '''
+    def __init__(self):
+        self.boxes = []
+
+    def add(self, box):
+        box = tuple(box[:4])
+        if self.covers(box):
+            return
+        self.boxes = [b for b in self.boxes if not contains(box, b)]
+        self.boxes.append(box)
+
+    def covers(self, box):
+        '''
+        True if box lies inside a proven-empty box
+        '''
+        return any(contains(b, box) for b in self.boxes)
+
+
+def _covers_range(lo, hi, inner_lo, inner_hi):
+    return (lo is None or (inner_lo is not None and lo <= inner_lo)) and (hi is None or (inner_hi is not None and inner_hi <= hi))
+
+
+def _inside(lo, hi, x, lower):
+    # x is the lower (or upper) end of a range, None = -inf (or inf)
+    if x is None:
+        return lo is None if lower else hi is None
+    return (lo is None or lo <= x) and (hi is None or x <= hi)
+
+
+def is_empty(box):
+    e_l, e_u, c_l, c_u = box[:4]
+    return (e_l is not None and e_u is not None and e_l > e_u) or (c_l is not None and c_u is not None and c_l > c_u)
+
+
+def tighten_box(box, archive, memo, c_step):
+    '''
+    returns box (e_l, e_u, c_l, c_u, ...) shrunk to the part not known to be empty or dominated, None if nothing is left
+    '''
+    e_l, e_u, c_l, c_u = box[:4]
+    changed = True
+    while changed:
+        changed = False
+        if is_empty((e_l, e_u, c_l, c_u)) or memo.covers((e_l, e_u, c_l, c_u)):
+            return None
+        # an empty box spanning the whole c range of the box cuts off an e side (and the other way round)
+        for b_e_l, b_e_u, b_c_l, b_c_u in memo.boxes:
+            if _covers_range(b_c_l, b_c_u, c_l, c_u):
+                if _inside(b_e_l, b_e_u, e_l, True) and b_e_u is not None:
+                    e_l, changed = b_e_u + 1, True
+                if _inside(b_e_l, b_e_u, e_u, False) and b_e_l is not None:
+                    e_u, changed = b_e_l - 1, True
+            if _covers_range(b_e_l, b_e_u, e_l, e_u):
+                if _inside(b_c_l, b_c_u, c_l, True) and b_c_u is not None:
+                    c_l, changed = b_c_u + c_step, True
+                if _inside(b_c_l, b_c_u, c_u, False) and b_c_l is not None:
+                    c_u, changed = b_c_l - c_step, True
+            if changed:
+                break
+        if changed:
+            continue
+        # a point with c' >= c_u dominates the part of the box with e <= e', a point with e' >= e_u the part with c <= c'
+        best_e = archive.best_e(c_u if c_u is not None else 1.0)
+        if best_e is not None and (e_l is None or e_l <= best_e):
+            e_l, changed = best_e + 1, True
+        if e_u is not None:
+            best_c = archive.best_c(e_u)
+            if best_c is not None and (c_l is None or c_l <= best_c):
+                c_l, changed = best_c + c_step, True
+    return (e_l, e_u, c_l, c_u, *box[4:])
@@ -0,0 +1,20 @@
+import os
+import csv
+
+'''
+Tables of the benchmarks (algorithms.py, LP_Relaxation.run_batch()): one csv per benchmark in examples/<instance>/results/benchmarks.
+'''
+
+
+def write_benchmark(dir_name, filename, rows):
+    '''
+    writes the rows (dicts with the same keys) of a benchmark to examples/<instance>/results/benchmarks/<filename> and prints them
+    '''
+    out_dir = os.path.join(dir_name, "results", "benchmarks")
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, filename), "w", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        w.writeheader()
+        w.writerows(rows)
+    for row in rows:
+        print(row)
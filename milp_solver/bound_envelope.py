@@ -0,0 +1,161 @@
+import os
+import csv
+import math
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from gurobipy import GRB
+
+from encoding import Encoding
+from archive import is_empty
+
+'''
+Upper bound curve of the Pareto front from a relaxation (Pareto_Points(..., relaxed_bound=(lam, tau, u, m) integral nodes)).
+
+Before the exact search, the relaxation (the LP when the four sets are empty, or a partially integral variant as in
+lp_relaxations.py) is solved once per correctness level k/N: maximize e subject to c >= k/N.
+Every exact solution is a solution of the relaxation, so no exact point with c >= k/N has e above that maximum (the
+objective bound when the relaxation is a MIP), and none has c >= k/N if the relaxation is infeasible there.
+The levels are solved by increasing k in one model, gurobi starts each from the previous basis.
+A box of the exact search is cut with it before it is solved (see Bound_Envelope.tighten()):
+    e_u <= floor(e bound at c_l) - e moves in steps of 1
+    c_u <  the first level whose e bound is below e_l
+so a box the relaxation leaves empty, or whose cut part is dominated by an archive point, is skipped without a MILP call.
+NOTE: the LP of this encoding is weak (its curve is nearly flat), the partially integral variants cut much more
+'''
+
+E_TOL = 1e-6 # solver tolerance on the relaxed bounds
+
+
+class Bound_Envelope:
+    '''
+    Instance attributes:
+        n_samples(int) - N, the correctness levels are k/N
+        levels(list) - (k, e_bound) by increasing k: no exact point with c >= k/N has e above e_bound (None = no exact point at all)
+        relaxation_calls(int) - number of relaxations solved
+        solve_time(float) - sum of their gurobi run times (seconds)
+        cuts(int) - boxes of the exact search cut by the envelope
+    '''
+    def __init__(self, n_samples):
+        self.n_samples = n_samples
+        self.levels = []
+        self.relaxation_calls = 0
+        self.solve_time = 0.0
+        self.cuts = 0
+
+    def e_bound(self, c_l):
+        '''
+        returns the largest e the relaxation allows to a point with c >= c_l, inf if no level is at or below c_l,
+        -inf if there is no such point
+        '''
+        k = 0 if c_l is None else math.ceil(c_l*self.n_samples - E_TOL)
+        bound = float("inf")
+        for level, e in self.levels:
+            if level > k:
+                break
+            bound = min(bound, float("-inf") if e is None else e)
+        return bound
+
+    def c_bound(self, e_l):
+        '''
+        returns the largest correctness a point with e >= e_l can have below the first level that excludes it, None if no level does
+        '''
+        for level, e in self.levels:
+            if e is None or (e_l is not None and math.floor(e + E_TOL) < e_l):
+                return (level - 1) / self.n_samples
+        return None
+
+    def tighten(self, box):
+        '''
+        returns box (e_l, e_u, c_l, c_u, ...) cut to the part the relaxation allows, None if nothing is left
+        '''
+        e_l, e_u, c_l, c_u = box[:4]
+        e_cap = self.e_bound(c_l)
+        if e_cap == float("-inf"):
+            return None
+        if e_cap != float("inf"):
+            e_cap = math.floor(e_cap + E_TOL)
+            if e_u is None or e_cap < e_u:
+                e_u = e_cap
+        c_cap = self.c_bound(e_l)
+        if c_cap is not None:
+            if c_cap < 0:
+                return None
+            if c_u is None or c_cap < c_u - E_TOL:
+                c_u = c_cap
+        if is_empty((e_l, e_u, c_l, c_u)):
+            return None
+        return (e_l, e_u, c_l, c_u, *box[4:])
+
+
+def relaxed_envelope(inp, root, int_nodes, levels=None, env=None, **encoding_options):
+    '''
+    returns the Bound_Envelope of the relaxation with the integral nodes int_nodes = (lam, tau, u, m)
+    levels - number of correctness levels solved, spread evenly over [0, 1] (None = all N + 1 of them, at least 2: both ends)
+    encoding_options - build_mode, presolve, formulation, symmetry_breaking of the exact Encoding
+    '''
+    if levels is not None and levels < 2:
+        raise ValueError(f"levels must be at least 2 (c = 0 and c = 1), got {levels}")
+    enc = Encoding(*int_nodes, inp, root, env=env, save_diagram=False, **encoding_options)
+    enc.set_objective_weights(1.0, 0.0) # maximize e
+    N = enc.N_SAMPLES
+    ks = range(N + 1) if levels is None else sorted({round(j*N / (levels - 1)) for j in range(levels)})
+    envelope = Bound_Envelope(N)
+    for k in ks:
+        enc.solve(None, None, k / N, None)
+        envelope.relaxation_calls += 1
+        envelope.solve_time += enc.model.Runtime
+        if enc.model.Status == GRB.INFEASIBLE:
+            # the levels above are infeasible as well
+            envelope.levels.append((k, None))
+            break
+        if enc.model.IsMIP:
+            bound = enc.model.ObjBound
+        elif enc.model.Status == GRB.OPTIMAL:
+            bound = enc.model.ObjVal
+        else:
+            continue # stopped by a limit without a bound
+        if not math.isinf(bound):
+            envelope.levels.append((k, bound))
+    enc.model.dispose()
+    print(f"Bound envelope: {envelope.relaxation_calls} relaxations solved in {envelope.solve_time:.4f} s")
+    return envelope
+
+
+def envelope_curves(pp):
+    '''
+    returns [(c, e_found, e_bound)] for c = 0, 1/N, ..., 1 (None = nothing with correctness >= c)
+    '''
+    N = pp.envelope.n_samples
+    rows = []
+    for k in range(N + 1):
+        c = k / N
+        found = [e for c_p, e, _ in pp.pareto_points if c_p >= c - 1e-9]
+        bound = pp.envelope.e_bound(c)
+        rows.append((c, max(found) if found else None, None if math.isinf(bound) else bound))
+    return rows
+
+
+def write_envelope_report(pp):
+    '''
+    writes the exact front next to the relaxed bound curve (bound_envelope_*.csv) and plots both (pareto_envelope_*.png)
+    '''
+    result_dir = os.path.join(pp.inp.filename, "results", f"I_{pp.enc.inp.max_nodes}_int_nodes_{pp.enc._int_tag}")
+    rows = envelope_curves(pp)
+    out_dir = os.path.join(result_dir, "pareto_points")
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, f"bound_envelope_I{pp.inp.max_nodes}_C{pp.inp.c_max}.csv"), "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["c", "e_found", "e_bound"])
+        w.writerows(rows)
+    out_dir = os.path.join(result_dir, "pareto_curves")
+    os.makedirs(out_dir, exist_ok=True)
+    plt.figure()
+    plt.step([c for c, _, b in rows if b is not None], [b for _, _, b in rows if b is not None], where="post", label="relaxed bound")
+    plt.plot([c for c, _, _ in pp.pareto_points], [e for _, e, _ in pp.pareto_points], marker="o", label="Pareto front")
+    plt.xlabel("Correctness")
+    plt.ylabel("Explainability")
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(os.path.join(out_dir, f"pareto_envelope_I{pp.inp.max_nodes}_C{pp.inp.c_max}.png"), dpi=300, bbox_inches="tight")
+    plt.close()
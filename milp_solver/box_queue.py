@@ -0,0 +1,124 @@
+import heapq
+import itertools
+import math
+
+'''
+Work queue of the boxes of the Pareto search.
+
+A box is a tuple (e_l, e_u, c_l, c_u, pool_bound), None marks an open side (pool_bound: see Pareto_Points.closing_candidate()).
+The order in which the boxes are solved is given by a policy:
+    depth_first - the last box pushed first, the order of the original recursion (explainability side before correctness side)
+    fifo - the first box pushed first (breadth first)
+    largest_area - the box with the most (e, c) cells first, e in steps of 1 and c in steps of one sample
+    widest_gap - the box whose corners are farthest apart in objective units, (e_u - e_l) + N*(c_u - c_l), first
+Open sides count as infinitely wide, ties are broken by the push order.
+A box that lies inside a pending box is dropped, and pending boxes inside a new box are removed:
+solving the larger box finds every Pareto point of the smaller one.
+'''
+
+POLICIES = ("depth_first", "fifo", "largest_area", "widest_gap")
+
+
+def contains(outer, inner):
+    '''
+    True if the box inner lies inside the box outer (None = open side)
+    '''
+    for lo_k, hi_k in ((0, 1), (2, 3)):
+        if outer[lo_k] is not None and (inner[lo_k] is None or inner[lo_k] < outer[lo_k]):
+            return False
+        if outer[hi_k] is not None and (inner[hi_k] is None or inner[hi_k] > outer[hi_k]):
+            return False
+    return True
+
+
+class Box_Queue:
+    '''
+    Instance attributes:
+        policy(str) - one of POLICIES
+        n_samples(int) - N, the width of a c step is 1/N
+        heap(list) - [key, seq, box] entries, entries of removed boxes have box None
+        size(int) - number of pending boxes
+        pushed(int), dropped(int) - number of boxes pushed / dropped or removed as duplicates
+    '''
+    def __init__(self, policy="depth_first", n_samples=1):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown policy {policy!r}, expected one of {POLICIES}")
+        self.policy = policy
+        self.n_samples = n_samples
+        self.heap = []
+        self.size = 0
+        self.pushed = 0
+        self.dropped = 0
+        self._seq = itertools.count()
+
+    def _spans(self, box):
+        '''
+        returns (number of e steps, number of c steps) of the box, inf for an open side
+        '''
+        e_l, e_u, c_l, c_u = box[:4]
+        e_span = math.inf if e_l is None or e_u is None else e_u - e_l
+        c_span = math.inf if c_l is None or c_u is None else (c_u - c_l) * self.n_samples
+        return e_span, c_span
+
+    def _key(self, box, seq):
+        if self.policy == "depth_first":
+            return -seq
+        if self.policy == "fifo":
+            return seq
+        e_span, c_span = self._spans(box)
+        if self.policy == "largest_area":
+            return -(e_span + 1) * (c_span + 1)
+        return -(e_span + c_span) # widest_gap
+
+    def push(self, box):
+        '''
+        adds a box unless it lies inside a pending box, returns whether it was added
+        '''
+        for entry in self.heap:
+            if entry[2] is not None and contains(entry[2], box):
+                self.dropped += 1
+                return False
+        for entry in self.heap:
+            if entry[2] is not None and contains(box, entry[2]):
+                entry[2] = None
+                self.size -= 1
+                self.dropped += 1
+        seq = next(self._seq)
+        heapq.heappush(self.heap, [self._key(box, seq), seq, box])
+        self.size += 1
+        self.pushed += 1
+        return True
+
+    def extend(self, boxes):
+        '''
+        pushes the children of a box; with depth_first the first child is popped first (like the recursion)
+        '''
+        for box in (reversed(boxes) if self.policy == "depth_first" else boxes):
+            self.push(box)
+
+    def pop(self):
+        '''
+        returns the next box (IndexError if there is none)
+        '''
+        while self.heap:
+            _, _, box = heapq.heappop(self.heap)
+            if box is not None:
+                self.size -= 1
+                return box
+        raise IndexError("pop from an empty Box_Queue")
+
+    def clear(self):
+        self.heap = []
+        self.size = 0
+
+    def pending(self):
+        '''
+        returns the pending boxes in the order they will be popped (for inspecting the remaining work)
+        '''
+        return [box for _, _, box in sorted(self.heap) if box is not None]
+
+    def __len__(self):
+        return self.size
+
+    def __bool__(self):
+        return self.size > 0
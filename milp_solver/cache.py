@@ -0,0 +1,68 @@
+import os
+import json
+import hashlib
+import numpy as np
+
+LOADER_VERSION = 2 # NOTE: bump this whenever Input changes what it computes, old cache files are then ignored
+CACHE_DIR = ".cache"
+
+'''
+Content-addressed on-disk cache for the preprocessed artifacts of Input.
+
+The key is a hash of samples.csv, features.txt, the loader version and the loader options, so editing any of
+the inputs (or the loader) gives a new file and stale entries are never read.
+Every entry is one uncompressed .npz file: the arrays are stored as they are and the metadata (predicates,
+leaves, weights, ...) as a json string under the key "meta".
+'''
+
+
+def input_cache_key(dir_name, options=""):
+    '''
+    returns the hex digest identifying the preprocessed version of the dataset in dir_name
+    '''
+    h = hashlib.sha256()
+    h.update(f"loader={LOADER_VERSION};{options}".encode())
+    for fname in ("samples.csv", "features.txt"):
+        h.update(fname.encode())
+        with open(os.path.join(dir_name, fname), "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()
+
+
+class Input_Cache:
+    '''
+    Instance attributes:
+        key(str) - the content hash of the dataset (see input_cache_key())
+        path(str) - the file the entry is stored in (<dir_name>/.cache/input_<key>.npz)
+    '''
+    def __init__(self, dir_name, options=""):
+        self.key = input_cache_key(dir_name, options)
+        self.path = os.path.join(dir_name, CACHE_DIR, f"input_{self.key[:32]}.npz")
+
+    def load(self):
+        '''
+        returns (meta, arrays) stored for this key, or None if there is no (readable) entry
+        '''
+        if not os.path.isfile(self.path):
+            return None
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                arrays = {name: data[name] for name in data.files if name != "meta"}
+                meta = json.loads(str(data["meta"]))
+        except (OSError, ValueError, KeyError):
+            return None
+        if meta.get("key") != self.key:
+            return None
+        return meta, arrays
+
+    def save(self, meta, arrays):
+        '''
+        writes the entry atomically (to a temporary file that is then renamed), so a crash never leaves a broken entry
+        '''
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        meta = dict(meta, key=self.key)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+        os.replace(tmp_path, self.path)
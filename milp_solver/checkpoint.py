@@ -0,0 +1,122 @@
+import os
+import json
+
+from cache import input_cache_key
+
+'''
+Append-only checkpoint of a Pareto search (Pareto_Points(..., checkpoint=True)).
+
+The file is results/I_<n>_int_nodes_<int tag>/checkpoint/checkpoint.jsonl, one json object per line, flushed to disk as
+soon as it is written:
+    {"event": "start", "key": ...} - the dataset, configuration and solve options the file belongs to (see checkpoint_key())
+    {"event": "solve", "box", "weights", "result", "infeasible", "open_box", "status"} - the outcome of one MILP: the point found
+        (incumbent, gap and bound included), or that the box is empty, or the part left unproven
+    {"event": "queued", "boxes"} - boxes waiting in the queue
+A run with the same key resumes by replay: the search is started again from scratch and every box whose outcome is
+in the file is answered from it instead of being solved, so the archive, the memo and the queue are rebuilt exactly
+as they were and the first MILP solved is the first one the interrupted run did not finish.
+The pending boxes of the interrupted run are the queued boxes without a solve outcome (see pending_boxes()).
+NOTE: a line cut by a crash is ignored, a file with another key is moved aside to checkpoint.jsonl.old
+'''
+
+CHECKPOINT_FILE = "checkpoint.jsonl"
+# the options of Pareto_Points that change the outcome of a solve (presolve and symmetry breaking change which of
+# several optimal diagrams is found, the limits whether a solve is proven, relax and fix which point is found)
+KEY_OPTIONS = ("presolve", "symmetry_breaking", "box_time_limit", "box_mip_gap", "relax_and_fix")
+
+
+def checkpoint_key(pp):
+    '''
+    returns the hash of the dataset, the number of nodes, the root, the integrality configuration and the solve options of pp
+    '''
+    options = ";".join(f"{name}={pp.worker_kwargs[name]!r}" for name in KEY_OPTIONS)
+    return input_cache_key(pp.inp.filename, f"I={pp.inp.max_nodes};root={pp.root};int={pp.enc._int_tag};{options}")
+
+
+def _box_key(box, weights):
+    return json.dumps([*box[:4], *weights])
+
+
+class Checkpoint:
+    '''
+    Instance attributes:
+        path(str) - the checkpoint file
+        key(str) - see checkpoint_key()
+        solves(dict) - json of [e_l, e_u, c_l, c_u, w_e, w_c] -> the "solve" entry of the box
+        queued(dict) - the boxes of the "queued" entries as keys (in the order they were queued)
+        replayed(int) - number of solves answered from the file
+    '''
+    def __init__(self, pp):
+        out_dir = os.path.join(pp.inp.filename, "results", f"I_{pp.enc.inp.max_nodes}_int_nodes_{pp.enc._int_tag}", "checkpoint")
+        os.makedirs(out_dir, exist_ok=True)
+        self.path = os.path.join(out_dir, CHECKPOINT_FILE)
+        self.key = checkpoint_key(pp)
+        self.solves = {}
+        self.queued = {}
+        self.replayed = 0
+        if self.load():
+            print(f"Resuming from {self.path}: {len(self.solves)} solved boxes")
+        else:
+            if os.path.isfile(self.path):
+                os.replace(self.path, self.path + ".old")
+            self._write({"event": "start", "key": self.key})
+
+    def load(self):
+        '''
+        reads the entries of the file, returns False if there is no file for this key
+        '''
+        if not os.path.isfile(self.path):
+            return False
+        with open(self.path) as f:
+            lines = f.read().splitlines()
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue # cut by a crash
+        if not entries or entries[0].get("event") != "start" or entries[0].get("key") != self.key:
+            return False
+        for entry in entries[1:]:
+            if entry["event"] == "solve":
+                self.solves[_box_key(entry["box"], entry["weights"])] = entry
+            elif entry["event"] == "queued":
+                self.queued.update((tuple(box), None) for box in entry["boxes"])
+        return True
+
+    def _write(self, entry):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def lookup(self, box, weights):
+        '''
+        returns the "solve" entry of the box solved with these objective weights, None if it was not solved yet
+        '''
+        entry = self.solves.get(_box_key(box, weights))
+        if entry is not None:
+            self.replayed += 1
+        return entry
+
+    def record_solve(self, box, weights, result, infeasible, open_box, status):
+        entry = {"event": "solve", "box": list(box[:4]), "weights": list(weights), "result": result,
+                 "infeasible": infeasible, "open_box": None if open_box is None else list(open_box), "status": status}
+        self.solves[_box_key(box, weights)] = entry
+        self._write(entry)
+
+    def record_queued(self, boxes):
+        '''
+        writes the boxes not queued before (a resumed run queues the boxes of the replayed solves again)
+        '''
+        new = [tuple(box[:4]) for box in boxes if tuple(box[:4]) not in self.queued]
+        if new:
+            self.queued.update((box, None) for box in new)
+            self._write({"event": "queued", "boxes": [list(box) for box in new]})
+
+    def pending_boxes(self):
+        '''
+        returns the queued boxes that have no solve outcome (with any objective weights)
+        '''
+        solved = {json.dumps(entry["box"]) for entry in self.solves.values()}
+        return [box for box in self.queued if json.dumps(list(box)) not in solved]
@@ -0,0 +1,173 @@
+import re
+import numpy as np
+
+'''
+Compiles the bucket conditions of a predicate (as written in features.txt) into an interval table.
+
+A condition is an interval of a single column when it has one of the forms
+    x < a , x <= a , x > a , x >= a , x == a  (or the mirrored a < x , ...)
+    a <= x < b , a < x <= b , ... (chained comparison, both operators pointing the same way)
+If all the conditions of a predicate are intervals of the same column and the intervals are pairwise disjoint
+and cover the whole real line, the whole column is bucketed with one np.searchsorted call.
+Otherwise the conditions are evaluated with a vectorized DataFrame.eval (one call per condition).
+'''
+
+NUMBER = r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?"
+NAME = r"[A-Za-z_][A-Za-z_0-9]*"
+OP = r"<=|>=|==|<|>"
+
+SINGLE_NAME_FIRST = re.compile(rf"^\s*({NAME})\s*({OP})\s*({NUMBER})\s*$")
+SINGLE_NUMBER_FIRST = re.compile(rf"^\s*({NUMBER})\s*({OP})\s*({NAME})\s*$")
+CHAINED = re.compile(rf"^\s*({NUMBER})\s*(<=|>=|<|>)\s*({NAME})\s*(<=|>=|<|>)\s*({NUMBER})\s*$")
+
+MIRROR = {"<": ">", "<=": ">=", ">": "<", ">=": "<=", "==": "=="}
+KEYWORDS = {"and", "or", "not", "True", "False", "in", "is"}
+
+
+def referenced_names(expression):
+    '''
+    returns the set of column names an expression (bucket condition or derived feature) refers to
+    '''
+    # numbers are matched first so that exponents (1e5) are not taken as names, names like y1 start with a letter and are kept whole
+    tokens = re.findall(rf"(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?|{NAME}", expression)
+    return {token for token in tokens if re.fullmatch(NAME, token)} - KEYWORDS
+
+
+class Interval:
+    '''
+    Instance attributes:
+        lo(float), hi(float) - end points of the interval (-inf / inf when unbounded)
+        lo_closed(bool), hi_closed(bool) - whether the end points belong to the interval
+    '''
+    def __init__(self, lo, lo_closed, hi, hi_closed):
+        self.lo = lo
+        self.lo_closed = lo_closed
+        self.hi = hi
+        self.hi_closed = hi_closed
+
+    def is_empty(self):
+        return self.lo > self.hi or (self.lo == self.hi and not (self.lo_closed and self.hi_closed))
+
+    def __repr__(self):
+        return f"{'[' if self.lo_closed else '('}{self.lo}, {self.hi}{']' if self.hi_closed else ')'}"
+
+
+def _comparison_to_interval(op, value):
+    '''
+    returns the interval described by "x <op> value"
+    '''
+    if op == "<":
+        return Interval(-np.inf, False, value, False)
+    if op == "<=":
+        return Interval(-np.inf, False, value, True)
+    if op == ">":
+        return Interval(value, False, np.inf, False)
+    if op == ">=":
+        return Interval(value, True, np.inf, False)
+    return Interval(value, True, value, True) # op is ==
+
+
+def parse_interval(condition):
+    '''
+    returns (column, Interval) if the condition is an interval of a single column, else None
+    '''
+    match = SINGLE_NAME_FIRST.match(condition)
+    if match:
+        name, op, value = match.groups()
+        return name, _comparison_to_interval(op, float(value))
+    match = SINGLE_NUMBER_FIRST.match(condition)
+    if match:
+        value, op, name = match.groups()
+        return name, _comparison_to_interval(MIRROR[op], float(value))
+    match = CHAINED.match(condition)
+    if match:
+        a, op1, name, op2, b = match.groups()
+        if op1 in ("<", "<=") and op2 in ("<", "<="):
+            return name, Interval(float(a), op1 == "<=", float(b), op2 == "<=")
+        if op1 in (">", ">=") and op2 in (">", ">="):
+            return name, Interval(float(b), op2 == ">=", float(a), op1 == ">=")
+    return None
+
+
+class Bucket_Table:
+    '''
+    Compiled form of the bucket conditions of one predicate.
+    Instance attributes:
+        conditions(list[str]) - the bucket conditions, bucket_id = position in the list
+        column(str) - the column all the conditions are intervals of (None if they are not all intervals of one column)
+        intervals(list[Interval]) - intervals[bucket_id] (empty if column is None)
+        is_partition(bool) - True if the intervals are pairwise disjoint and cover the whole real line
+        problems(list[str]) - reasons why the conditions could not be proven to be a partition
+        thresholds(np.ndarray) - (only for partitions) sorted boundaries, a value v lies in the
+                                 searchsorted(thresholds, v, side="right")-th interval from the left
+        order(np.ndarray) - (only for partitions) order[k] is the bucket_id of the k-th interval from the left
+    '''
+    def __init__(self, conditions):
+        self.conditions = list(conditions)
+        self.column = None
+        self.intervals = []
+        self.is_partition = False
+        self.problems = []
+        self.thresholds = None
+        self.order = None
+        self.compile()
+
+    def compile(self):
+        parsed = [parse_interval(condition) for condition in self.conditions]
+        if not parsed or any(x is None for x in parsed):
+            self.problems.append("some conditions are not intervals of a single column")
+            return
+        columns = {name for name, _ in parsed}
+        if len(columns) != 1:
+            self.problems.append(f"conditions refer to different columns {sorted(columns)}")
+            return
+        self.column = columns.pop()
+        self.intervals = [interval for _, interval in parsed]
+        self.check_partition()
+
+    def check_partition(self):
+        '''
+        sorts the intervals from left to right and checks that consecutive intervals touch without overlapping
+        '''
+        for bucket_id, interval in enumerate(self.intervals):
+            if interval.is_empty():
+                self.problems.append(f"bucket {bucket_id} ({self.conditions[bucket_id]}) is empty")
+        order = sorted(range(len(self.intervals)), key=lambda k: (self.intervals[k].lo, not self.intervals[k].lo_closed))
+        sorted_intervals = [self.intervals[k] for k in order]
+        if sorted_intervals[0].lo != -np.inf:
+            self.problems.append(f"values below {sorted_intervals[0].lo} are not covered")
+        if sorted_intervals[-1].hi != np.inf:
+            self.problems.append(f"values above {sorted_intervals[-1].hi} are not covered")
+        for left, right in zip(sorted_intervals, sorted_intervals[1:]):
+            if left.hi > right.lo or (left.hi == right.lo and left.hi_closed and right.lo_closed):
+                self.problems.append(f"{left} and {right} overlap")
+            elif left.hi < right.lo or (not left.hi_closed and not right.lo_closed):
+                self.problems.append(f"the gap between {left} and {right} is not covered")
+        if self.problems:
+            return
+        # a boundary t that belongs to the interval on its right is passed by v >= t, otherwise by v > t;
+        # v > t is the same as v >= nextafter(t, inf), so every boundary can be searched with side="right"
+        self.thresholds = np.array([
+            right.lo if right.lo_closed else np.nextafter(right.lo, np.inf)
+            for right in sorted_intervals[1:]
+        ], dtype=np.float64)
+        self.order = np.array(order, dtype=np.int64)
+        self.is_partition = True
+
+    def bucketize(self, df):
+        '''
+        returns a bool array of shape (len(df), number of conditions), entry [s, c] is True iff sample s satisfies condition c
+        '''
+        n = len(df)
+        result = np.zeros((n, len(self.conditions)), dtype=bool)
+        if self.is_partition and self.column in df.columns and np.issubdtype(df[self.column].dtype, np.number):
+            values = df[self.column].to_numpy(dtype=np.float64)
+            position = np.searchsorted(self.thresholds, values, side="right")
+            known = ~np.isnan(values) # NaN satisfies no comparison
+            result[np.nonzero(known)[0], self.order[position[known]]] = True
+            return result
+        for bucket_id, condition in enumerate(self.conditions):
+            value = df.eval(condition, engine="python")
+            # a condition that does not reference any column evaluates to a scalar
+            result[:, bucket_id] = np.broadcast_to(np.asarray(value, dtype=bool), (n,))
+        return result
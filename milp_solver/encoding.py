@@ -2,9 +2,12 @@ import matplotlib.pyplot as plt
 from matplotlib import cm, colors as mcolors
 from collections import deque
 from inputs import Input
+from matrix_builder import Matrix_Builder, is_redundant
 import gurobipy as gp
 from gurobipy import GRB
 import os
+import time
+import numpy as np
 
 MAX_NODES = 10000
 
@@ -15,6 +18,12 @@ def node_order(j):
         return MAX_NODES + int(j[1:]) #NOTE:use macro here ------> Done!
     return MAX_NODES  
 
+def value(x):
+    '''
+    value of x in the last solution, x is a variable or (in the presolved build) a constant it was replaced with
+    '''
+    return x.X if isinstance(x, gp.Var) else float(x)
+
 
 '''
 Instance attributes:
@@ -22,6 +31,14 @@ inp(Input)
 tau, lam , ...... other encoding variables
 ints_pos - specifying for which i tau_{icj} and lam_{ip} should be made integral
 root - which node should be considered as the root
+build_mode - "loop" adds the constraints one by one, "matrix" emits every constraint family as one sparse block (see matrix_builder.py)
+presolve - if True, variables that are provably constant are replaced by their values (see the NOTE in __init__) and
+           constraints that are then implied by the [0,1] bounds of the variables are not added
+formulation - "standard" (the encoding above) or "compact": b is replaced by the sum it stands for and d is not used
+              (see compact_sample_constraints()), only valid when the buckets of every predicate form a partition
+              or "flow": every sample class is a unit of flow f[i,c,j,s] from the root to the leaf of its label, m only exists for the root
+              (see flow_sample_constraints())
+symmetry_breaking - if True, adds symmetry_breaking_constraints() (active nodes form a prefix, inactive nodes are in a fixed state)
 Instance functions:
 tree_constraints() - adds the constraints that builds up the tree
 samples_constraints() - adds the contraints that parse the samples on the tree for calculating correctness
@@ -29,33 +46,46 @@ reachability_constraints() - adds the constraints that parse the tree for reacha
 objective() - sets the objective, optimizes the model and returns the solution
 '''
 class Encoding:
-    def __init__(self, lam_int_nodes, tau_int_nodes , u_int_nodes , m_int_nodes, inp:Input , root , MAX_EXPLANATION = 1037): #NOTE:give better name to int_pos
+    def __init__(self, lam_int_nodes, tau_int_nodes , u_int_nodes , m_int_nodes, inp:Input , root , MAX_EXPLANATION = 1037, build_mode = "loop", presolve = False, formulation = "standard", symmetry_breaking = False, env = None, save_diagram = True): #NOTE:give better name to int_pos
+        if build_mode not in ("loop", "matrix"):
+            raise ValueError(f"unknown build_mode {build_mode!r}, expected 'loop' or 'matrix'")
+        if formulation not in ("standard", "compact", "flow"):
+            raise ValueError(f"unknown formulation {formulation!r}, expected 'standard', 'compact' or 'flow'")
+        if formulation == "compact" and not inp.buckets_validated:
+            raise ValueError("the compact formulation needs the buckets of every predicate to form a partition (see Input.compile_predicates)")
         self.inp = inp
+        self.build_mode = build_mode
+        self.presolve = presolve
+        self.formulation = formulation
+        self.symmetry_breaking = symmetry_breaking
         self.lam_int_nodes = set(lam_int_nodes) #converting to set because it is faster to check containment in set
         self.tau_int_nodes = set(tau_int_nodes)
         self.u_int_nodes = set(u_int_nodes)
         self.m_int_nodes = set(m_int_nodes)
         self.root = root
         self.MAX_EXPLANATION = MAX_EXPLANATION 
-        self.I = range(self.inp.max_nodes)
+        # NOTE: presolve - the nodes below the root are never reached from it (every tau points to a larger node) and are inactive,
+        # they get no variables at all and only contribute their constant (max_weight+1) each to the explainability
+        self.I = range(self.root, self.inp.max_nodes) if self.presolve else range(self.inp.max_nodes)
+        self.num_pruned_nodes = self.I.start
         self.C= range(self.inp.c_max)
         self.P = range(len(self.inp.predicates))
-        self.S = range(len(self.inp.samples.updated_samples))
+        # samples are encoded per (bucket signature, label) class, weights[s] is the number of samples in class s
+        self.S = range(len(self.inp.class_weights))
+        self.weights = [int(w) for w in self.inp.class_weights]
+        self.N_SAMPLES = self.inp.num_samples
         self.L = {f"L{i}":label for i,label in enumerate(self.inp.leaves)}
         self._built = False
-        def _fmt(nodes):
-            return "none" if not nodes else "_".join(str(i) for i in sorted(nodes))
-        self._int_tag = (
-            f"l_{_fmt(self.lam_int_nodes)}"
-            f"_tau_{_fmt(self.tau_int_nodes)}"
-            f"_u_{_fmt(self.u_int_nodes)}"
-            f"_m_{_fmt(self.m_int_nodes)}"
-        )
+        self.objective_weights = (1.0, 1.0) # objective w_e*e + w_c*N*c, see set_objective_weights()
+        self.last_overhead = 0.0 # seconds spent by the last solve() before optimize()
+        self.save_diagram = save_diagram # False: solve() neither prints the variables nor plots the decision diagram
+        self.optimize_callback = None # passed on to model.optimize() (e.g. Warm_Start.callback)
+        self._int_tag = self._make_int_tag()
         # self._int_tag = "none" if not self.int_nodes else "_".join(str(i) for i in sorted(self.int_nodes))
-        self.C_QUANT = 1.0/len(self.S)
+        self.C_QUANT = 1.0/self.N_SAMPLES # correctness moves in steps of one original sample
         self.E_ROUNDING_LIMIT = 6
 
-        self.model = gp.Model("pareto_points_exploration")
+        self.model = gp.Model("pareto_points_exploration", env=env) # env: an own gp.Env per worker process (see parallel_boxes.py)
         lam_int = self.model.addVars(
             ((i,p) for i in self.I if i in self.lam_int_nodes for p in self.P) , vtype = GRB.INTEGER, lb = 0.0, ub =1.0, name = "lam"
         )
@@ -82,115 +112,278 @@ class Encoding:
         self.tau.update(tau_cont)
 
         # self.m = self.model.addVars(((i,s) for i in all_nodes for s in self.S), vtype=GRB.CONTINUOUS , lb=0.0 , ub = 1.0 , name="m")
+        if self.formulation == "flow":
+            m_nodes = [self.root] # m[root,s] is the flow of class s out of the root
+        else:
+            m_nodes = list(self.I) if self.presolve else all_nodes
         m_int = self.model.addVars(
-            ((i,s) for i in all_nodes if i in self.m_int_nodes for s in self.S) , vtype = GRB.INTEGER, lb = 0.0, ub =1.0, name = "m"
+            ((i,s) for i in m_nodes if i in self.m_int_nodes for s in self.S) , vtype = GRB.INTEGER, lb = 0.0, ub =1.0, name = "m"
         )
         m_cont = self.model.addVars(
-            ((i,s) for i in all_nodes if i not in self.m_int_nodes for s in self.S) , vtype = GRB.CONTINUOUS, lb = 0.0, ub =1.0, name = "m"
+            ((i,s) for i in m_nodes if i not in self.m_int_nodes for s in self.S) , vtype = GRB.CONTINUOUS, lb = 0.0, ub =1.0, name = "m"
         )
         self.m = gp.tupledict()
         self.m.update(m_int)
         self.m.update(m_cont)
-        self.b = self.model.addVars(((i, c, s) for i in self.I for c in self.C for s in self.S),vtype=GRB.CONTINUOUS, lb=0.0, ub=1.0, name="b")
-        self.d = self.model.addVars(((i, c, j, s) for i in self.I for c in self.C for j in all_nodes if node_order(j) > i for s in self.S),vtype=GRB.CONTINUOUS, lb=0.0, ub=1.0, name="d")
+        membership = self.inp.class_membership
+        label_idx = self.inp.class_label_idx
+        if self.presolve:
+            # NOTE: presolve - the leaves are constants (1 iff the class has the label of the leaf), b[i,c,s] is 0 if no predicate puts
+            # class s in bucket c, and d[i,c,j,s] <= min(b[i,c,s], m[j,s]) is 0 whenever one of the two is
+            for k, l_key in enumerate(self.L.keys() if self.formulation != "flow" else ()):
+                for s in self.S:
+                    self.m[l_key, s] = float(label_idx[s] == k)
+            b_zero = ~membership.any(axis=1).T # b_zero[c, s]
+        else:
+            b_zero = np.zeros((len(self.C), len(self.S)), dtype=bool)
+        b_keys = [(i, c, s) for i in self.I for c in self.C for s in self.S if not b_zero[c, s]]
+        d_keys = [(i, c, j, s) for i in self.I for c in self.C for j in all_nodes if node_order(j) > i for s in self.S
+                  if not b_zero[c, s] and not (self.presolve and j in self.L and label_idx[s] != int(j[1:]))]
+        # flow of class s can only end in the leaf of its label and (like d) never uses a bucket class s is not in
+        f_keys = [(i, c, j, s) for i in self.I for c in self.C for j in all_nodes if node_order(j) > i for s in self.S
+                  if not b_zero[c, s] and not (j in self.L and label_idx[s] != int(j[1:]))]
+        if self.formulation != "standard":
+            b_keys, d_keys = [], []
+        if self.formulation != "flow":
+            f_keys = []
+        if self.build_mode == "matrix":
+            # b, d and f are by far the largest families, they are added as one MVar each and indexed like in the loop mode
+            self.b = gp.tupledict(zip(b_keys, self.model.addMVar(len(b_keys), lb=0.0, ub=1.0, vtype=GRB.CONTINUOUS, name="b").tolist()))
+            self.d = gp.tupledict(zip(d_keys, self.model.addMVar(len(d_keys), lb=0.0, ub=1.0, vtype=GRB.CONTINUOUS, name="d").tolist()))
+            self.f = gp.tupledict(zip(f_keys, self.model.addMVar(len(f_keys), lb=0.0, ub=1.0, vtype=GRB.CONTINUOUS, name="f").tolist()))
+        else:
+            self.b = self.model.addVars(b_keys, vtype=GRB.CONTINUOUS, lb=0.0, ub=1.0, name="b")
+            self.d = self.model.addVars(d_keys, vtype=GRB.CONTINUOUS, lb=0.0, ub=1.0, name="d")
+            self.f = self.model.addVars(f_keys, vtype=GRB.CONTINUOUS, lb=0.0, ub=1.0, name="f")
+        if self.presolve and self.formulation == "standard":
+            for i in self.I:
+                for c in self.C:
+                    for j in all_nodes:
+                        if node_order(j) > i:
+                            for s in self.S:
+                                if (i, c, s) not in self.b:
+                                    self.b[i, c, s] = 0.0
+                                if (i, c, j, s) not in self.d:
+                                    self.d[i, c, j, s] = 0.0
         # self.u = self.model.addVars(self.I, vtype=GRB.CONTINUOUS, lb=0.0, ub=1.0, name="u")
         u_int = self.model.addVars(
-            (i for i in self.I if i in self.u_int_nodes) , vtype = GRB.INTEGER, lb = 0.0, ub =1.0, name = "u"
+            (i for i in self.I if i in self.u_int_nodes and not (self.presolve and i == self.root)) , vtype = GRB.INTEGER, lb = 0.0, ub =1.0, name = "u"
         )
         u_cont = self.model.addVars(
-            (i for i in self.I if i not in self.u_int_nodes ) , vtype = GRB.CONTINUOUS, lb = 0.0, ub =1.0, name = "u"
+            (i for i in self.I if i not in self.u_int_nodes and not (self.presolve and i == self.root)) , vtype = GRB.CONTINUOUS, lb = 0.0, ub =1.0, name = "u"
         )
         self.u = gp.tupledict()
         self.u.update(u_int)
         self.u.update(u_cont)
-        self.z_u = self.model.addVars(((i, c, j) for i in self.I for c in self.C for j in all_nodes if node_order(j) > i),vtype=GRB.CONTINUOUS, lb=0.0, ub=1.0, name="z_u")
-        self.o_u = self.model.addVars(((i, p) for i in self.I for p in self.P),vtype=GRB.CONTINUOUS, lb=0.0, ub=1.0, name="o_u")
+        if not self.presolve:
+            self.z_u = self.model.addVars(((i, c, j) for i in self.I for c in self.C for j in all_nodes if node_order(j) > i),vtype=GRB.CONTINUOUS, lb=0.0, ub=1.0, name="z_u")
+            self.o_u = self.model.addVars(((i, p) for i in self.I for p in self.P),vtype=GRB.CONTINUOUS, lb=0.0, ub=1.0, name="o_u")
+        else:
+            # NOTE: presolve - the root is active, so z_u[root,c,j] = tau[root,c,j] and o_u[root,p] = lam[root,p] (the same variables are reused);
+            # z_u[i,c,j] is only used for internal j
+            self.u[self.root] = 1.0
+            self.z_u = self.model.addVars(((i, c, j) for i in self.I if i != self.root for c in self.C for j in self.I if j > i),vtype=GRB.CONTINUOUS, lb=0.0, ub=1.0, name="z_u")
+            self.z_u.update({(self.root, c, j): self.tau[self.root, c, j] for c in self.C for j in self.I if j > self.root})
+            self.o_u = self.model.addVars(((i, p) for i in self.I if i != self.root for p in self.P),vtype=GRB.CONTINUOUS, lb=0.0, ub=1.0, name="o_u")
+            self.o_u.update({(self.root, p): self.lam[self.root, p] for p in self.P})
+
+    def _make_int_tag(self):
+        def _fmt(nodes):
+            return "none" if not nodes else "_".join(str(i) for i in sorted(nodes))
+        tag = (
+            f"l_{_fmt(self.lam_int_nodes)}"
+            f"_tau_{_fmt(self.tau_int_nodes)}"
+            f"_u_{_fmt(self.u_int_nodes)}"
+            f"_m_{_fmt(self.m_int_nodes)}"
+        )
+        if self.formulation != "standard":
+            tag += f"_{self.formulation}"
+        return tag
+
+    def set_integrality(self, lam_int_nodes, tau_int_nodes, u_int_nodes, m_int_nodes):
+        '''
+        makes the lam, tau, u and m variables of the given nodes integral and the others continuous, in place:
+        the constraints, the bound rows and the objective are kept, so several integrality configurations are
+        solved with a single build (see LP_Relaxation.run_sequence())
+        '''
+        self.lam_int_nodes = set(lam_int_nodes)
+        self.tau_int_nodes = set(tau_int_nodes)
+        self.u_int_nodes = set(u_int_nodes)
+        self.m_int_nodes = set(m_int_nodes)
+        variables, vtypes = [], []
+        for block, nodes in ((self.lam, self.lam_int_nodes), (self.tau, self.tau_int_nodes), (self.u, self.u_int_nodes), (self.m, self.m_int_nodes)):
+            for key, var in block.items():
+                if isinstance(var, gp.Var): # presolve replaced some entries with constants
+                    variables.append(var)
+                    vtypes.append(GRB.INTEGER if (key if isinstance(key, int) else key[0]) in nodes else GRB.CONTINUOUS)
+        self.model.setAttr("VType", variables, vtypes)
+        self.model.update()
+        self._int_tag = self._make_int_tag()
 
     def B_P(self, p):
         return self.inp.predicates[p].num_buckets
     
+    def _add_constr(self, lhs, sense, rhs, name=""):
+        '''
+        adds the constraint lhs <sense> rhs; in the presolved build lhs - rhs is first simplified (constants moved to the right hand side,
+        repeated variables merged) and the constraint is skipped if every point of the [0,1] box of the variables satisfies it
+        '''
+        if not self.presolve:
+            return self.model.addLConstr(lhs, sense, rhs, name=name)
+        expr = gp.LinExpr()
+        expr.add(lhs)
+        expr.add(rhs, -1.0)
+        coeffs = {}
+        for k in range(expr.size()):
+            var = expr.getVar(k)
+            coeffs[var.index] = (var, coeffs.get(var.index, (var, 0.0))[1] + expr.getCoeff(k))
+        coeffs = {index: (var, a) for index, (var, a) in coeffs.items() if a != 0.0}
+        bound = -expr.getConstant()
+        max_activity = sum(a for _, a in coeffs.values() if a > 0)
+        min_activity = sum(a for _, a in coeffs.values() if a < 0)
+        if is_redundant(max_activity, min_activity, sense, bound):
+            return None
+        return self.model.addLConstr(gp.LinExpr([a for _, a in coeffs.values()], [var for var, _ in coeffs.values()]), sense, bound, name=name)
+
+    def explainability_expr(self):
+        '''
+        (max_weight+1) * number of inactive nodes + sum of the weights of the predicates of the active nodes
+        '''
+        return ((self.inp.max_weight+1)*(self.num_pruned_nodes + gp.quicksum(1 - self.u[i] for i in self.I)) +
+                gp.quicksum(self.inp.predicates[p].weight * self.o_u[i, p] for i in self.I for p in self.P))
+
     def tree_constraints(self):
         # every internal node is assigned exactly one predicate
         for i in self.I:
-            self.model.addConstr(gp.quicksum(self.lam[i, p] for p in self.P) == 1)
+            self._add_constr(gp.quicksum(self.lam[i, p] for p in self.P), GRB.EQUAL, 1)
 
-        # unique transitions + parent-child predicate distinctness + consistency
+        # unique transitions + parent-child predicate distinctness
+        # NOTE: the "lam[i,p] + sum_j tau[i,c,j] <= 2" (unique transitions) and "<= 1" (consistency, no child if c >= num_buckets)
+        # rows are not added: with sum_p lam[i,p] == 1 the equality sum_j tau[i,c,j] == sum_p valid_branch(c,p)*lam[i,p] below
+        # gives sum_j tau[i,c,j] <= 1 and, for c >= B_P(p), sum_j tau[i,c,j] <= 1 - lam[i,p] (in the relaxation as well)
         all_nodes = list(self.I) + list(self.L.keys())
         for i in self.I:
             for p in self.P:
                 for c in self.C:
                     if c < self.B_P(p):
-                        self.model.addConstr((self.lam[i, p] + gp.quicksum(self.tau[i, c, j] for j in all_nodes if node_order(j) > i)) <= 2)
-                        self.model.addConstr(self.lam[i, p] <= gp.quicksum(self.tau[i, c, j] for j in all_nodes if node_order(j) > i))
+                        self._add_constr(self.lam[i, p], GRB.LESS_EQUAL, gp.quicksum(self.tau[i, c, j] for j in all_nodes if node_order(j) > i))
                         for j in self.I:
                             if node_order(j) > i:
-                                self.model.addConstr(self.lam[i, p] + self.tau[i, c, j] + self.lam[j, p] <= 2)
+                                self._add_constr(self.lam[i, p] + self.tau[i, c, j] + self.lam[j, p], GRB.LESS_EQUAL, 2)
         #NOTE: State assumptions beforehand
         for i in self.I:
             for c in self.C:
-                self.model.addConstr(gp.quicksum(self.tau[i,c,j] for j in all_nodes if node_order(j)>i) == gp.quicksum(self.inp.valid_branch(c,p)*self.lam[i,p] for p in self.P))
-
-        # consistency constraints (no child if c >= num_buckets)
-        for i in self.I:
-            for p in self.P:
-                if self.B_P(p) <= self.C[-1] :
-                    for c in self.C:
-                        if c >= self.B_P(p):
-                            self.model.addConstr((self.lam[i, p] + gp.quicksum(self.tau[i, c, j] for j in all_nodes if node_order(j) > i)) <= 1,name="consistency")
+                self._add_constr(gp.quicksum(self.tau[i,c,j] for j in all_nodes if node_order(j)>i), GRB.EQUAL, gp.quicksum(self.inp.valid_branch(c,p)*self.lam[i,p] for p in self.P))
 
     def sample_constraints(self):
+        if self.formulation == "compact":
+            self.compact_sample_constraints()
+            return
+        if self.formulation == "flow":
+            self.flow_sample_constraints()
+            return
         all_nodes = list(self.I) + list(self.L.keys())
+        # func(s,p,c) and the leaf labels are read from the arrays precomputed in Input (one row per sample class)
+        membership = self.inp.class_membership
+        label_idx = self.inp.class_label_idx
 
         for s in self.S:
             #labelling the leaf
-            for l_key,l_value in self.L.items():
-                self.model.addConstr(self.m[l_key,s] == self.inp.func(s,l_value), name = "leaf")
+            for k, l_key in enumerate(self.L.keys()):
+                self._add_constr(self.m[l_key,s], GRB.EQUAL, int(label_idx[s] == k), name = "leaf")
 
             for i in self.I:
                 for c in self.C:
                     # b[i,c,s] = sum_p func(s,p,c) * lam[i,p]
-                    self.model.addConstr(
-                        self.b[i, c, s] == gp.quicksum(self.inp.func(s, p, c) * self.lam[i, p] for p in self.P),
-                        name="forming_b"
-                    )
+                    self._add_constr(self.b[i, c, s], GRB.EQUAL, gp.quicksum(self.lam[i, p] for p in self.P if membership[s, p, c]), name="forming_b")
 
                     for j in all_nodes:
                         if node_order(j) > i:
                             # m lower bound
-                            self.model.addConstr(self.b[i, c, s] + self.m[j, s] + self.tau[i, c, j] - 2 <= self.m[i, s],
-                                                 name="m_lower_bound")
+                            self._add_constr(self.b[i, c, s] + self.m[j, s] + self.tau[i, c, j] - 2, GRB.LESS_EQUAL, self.m[i, s], name="m_lower_bound")
                             # d triangle bounds
-                            self.model.addConstr(self.d[i, c, j, s] >= self.b[i, c, s] + self.m[j, s] + self.tau[i, c, j] - 2,
-                                                 name="d_upper_bound")
-                            self.model.addConstr(self.d[i, c, j, s] <= self.b[i, c, s])
-                            self.model.addConstr(self.d[i, c, j, s] <= self.m[j, s])
-                            self.model.addConstr(self.d[i, c, j, s] <= self.tau[i, c, j])
+                            self._add_constr(self.d[i, c, j, s], GRB.GREATER_EQUAL, self.b[i, c, s] + self.m[j, s] + self.tau[i, c, j] - 2, name="d_upper_bound")
+                            self._add_constr(self.d[i, c, j, s], GRB.LESS_EQUAL, self.b[i, c, s])
+                            self._add_constr(self.d[i, c, j, s], GRB.LESS_EQUAL, self.m[j, s])
+                            self._add_constr(self.d[i, c, j, s], GRB.LESS_EQUAL, self.tau[i, c, j])
 
                     # flow consistency
-                    self.model.addConstr(
-                        gp.quicksum(self.d[i, c, j, s] for j in all_nodes if node_order(j) > i) <= self.b[i, c, s]
-                    )
+                    self._add_constr(gp.quicksum(self.d[i, c, j, s] for j in all_nodes if node_order(j) > i), GRB.LESS_EQUAL, self.b[i, c, s])
 
                 # m upper bound
                 # self.model.addConstr(
                 #     # self.m[i, s] <= gp.quicksum(self.d[i, c, j, s] for c in self.C for j in all_nodes if node_order(j) > i),
                 #     name="m_upper_bound"
                 # )
-                self.model.addConstr(
-                    self.m[i, s] <= gp.quicksum(self.d[i, c, j, s] for c in self.C for j in all_nodes if node_order(j) > i),
-                    name="m_upper_bound"
-                )
+                self._add_constr(self.m[i, s], GRB.LESS_EQUAL, gp.quicksum(self.d[i, c, j, s] for c in self.C for j in all_nodes if node_order(j) > i), name="m_upper_bound")
+
+    def compact_sample_constraints(self):
+        '''
+        sample constraints without b and d: b[i,c,s] is replaced by the expression sum_p func(s,p,c)*lam[i,p] it is defined by.
+        If the buckets of every predicate form a partition, class s leaves an active node i through exactly one arc (i,c,j) with
+        tau[i,c,j] = b[i,c,s] = 1 and m[i,s] = m[j,s] for that arc, which is what the two rows per arc below express
+        (the standard formulation needs d to get the upper bound).
+        '''
+        all_nodes = list(self.I) + list(self.L.keys())
+        membership = self.inp.class_membership
+        label_idx = self.inp.class_label_idx
+        # classes with a missing value fall in no bucket of some predicate, m[i,s] <= sum_c b[i,c,s] is only needed for them
+        covered = membership.any(axis=2).all(axis=1)
+
+        for s in self.S:
+            #labelling the leaf
+            for k, l_key in enumerate(self.L.keys()):
+                self._add_constr(self.m[l_key,s], GRB.EQUAL, int(label_idx[s] == k), name = "leaf")
+
+            for i in self.I:
+                for c in self.C:
+                    b = gp.quicksum(self.lam[i, p] for p in self.P if membership[s, p, c])
+                    for j in all_nodes:
+                        if node_order(j) > i:
+                            self._add_constr(b + self.m[j, s] + self.tau[i, c, j] - 2, GRB.LESS_EQUAL, self.m[i, s], name="m_lower_bound")
+                            self._add_constr(self.m[i, s], GRB.LESS_EQUAL, self.m[j, s] + 2 - self.tau[i, c, j] - b, name="m_upper_bound")
+                if not covered[s]:
+                    self._add_constr(self.m[i, s], GRB.LESS_EQUAL, gp.quicksum(self.lam[i, p] for c in self.C for p in self.P if membership[s, p, c]))
+
+    def flow_sample_constraints(self):
+        '''
+        sample constraints of the flow formulation: class s sends m[root,s] units of flow from the root, flow is conserved at every other
+        internal node, leaves the nodes only through the arcs (i,c,j) with tau[i,c,j] = 1 of the buckets c class s falls in
+        (sum_j f[i,c,j,s] <= b[i,c,s] = sum_p func(s,p,c)*lam[i,p]) and can only be absorbed by the leaf of its label.
+        '''
+        membership = self.inp.class_membership
+        flow_in, flow_out, flow_bucket = {}, {}, {}
+        for (i, c, j, s), f in self.f.items():
+            flow_out.setdefault((i, s), []).append(f)
+            flow_bucket.setdefault((i, c, s), []).append(f)
+            if j not in self.L:
+                flow_in.setdefault((j, s), []).append(f)
+
+        for s in self.S:
+            # the flow out of the root is the correctness of class s
+            self._add_constr(gp.quicksum(flow_out.get((self.root, s), [])), GRB.EQUAL, self.m[self.root, s], name="root_flow")
+            for i in self.I:
+                # flow conservation
+                if i != self.root:
+                    self._add_constr(gp.quicksum(flow_in.get((i, s), [])), GRB.EQUAL, gp.quicksum(flow_out.get((i, s), [])), name="flow_conservation")
+                # bucket capacity
+                for c in self.C:
+                    if (i, c, s) in flow_bucket:
+                        self._add_constr(gp.quicksum(flow_bucket[i, c, s]), GRB.LESS_EQUAL, gp.quicksum(self.lam[i, p] for p in self.P if membership[s, p, c]), name="bucket_capacity")
+        # arc capacity
+        for (i, c, j, s), f in self.f.items():
+            self._add_constr(f, GRB.LESS_EQUAL, self.tau[i, c, j], name="arc_capacity")
 
     def reachability_constraints(self):
         all_nodes = list(self.I) + list(self.L.keys())
 
         # root active
-        self.model.addConstr(self.u[self.root] == 1, name="root_active")
+        self._add_constr(self.u[self.root], GRB.EQUAL, 1, name="root_active")
 
         #all nodes with index less than root inactive
         for j in self.I:
             if j < self.root:
-                self.model.addConstr(self.u[j] ==0 , name="nodes_less_than_root_inactive")
+                self._add_constr(self.u[j], GRB.EQUAL, 0, name="nodes_less_than_root_inactive")
 
         # top-down reachability
         for j in all_nodes:
@@ -198,71 +391,114 @@ class Encoding:
                 if i < node_order(j) :
                     for c in self.C:
                         if j in self.I:
-                            self.model.addConstr(self.u[j] >= self.tau[i, c, j] + self.u[i] - 1)
-                            self.model.addConstr(self.z_u[i, c, j] >= self.u[i] + self.tau[i, c, j] - 1)
-                            self.model.addConstr(self.z_u[i, c, j] <= self.u[i])
-                            self.model.addConstr(self.z_u[i, c, j] <= self.tau[i, c, j])
+                            self._add_constr(self.u[j], GRB.GREATER_EQUAL, self.tau[i, c, j] + self.u[i] - 1)
+                            self._add_constr(self.z_u[i, c, j], GRB.GREATER_EQUAL, self.u[i] + self.tau[i, c, j] - 1)
+                            self._add_constr(self.z_u[i, c, j], GRB.LESS_EQUAL, self.u[i])
+                            self._add_constr(self.z_u[i, c, j], GRB.LESS_EQUAL, self.tau[i, c, j])
 
             if j in self.I and j != self.root:
-                self.model.addConstr(
-                    self.u[j] <= gp.quicksum(self.z_u[i, c, j] for i in self.I if i < node_order(j) for c in self.C)
-                )
+                self._add_constr(self.u[j], GRB.LESS_EQUAL, gp.quicksum(self.z_u[i, c, j] for i in self.I if i < node_order(j) for c in self.C))
 
         # o_u linking: only one active predicate per active node
         for i in self.I:
             for p in self.P:
-                self.model.addConstr(self.o_u[i, p] >= self.u[i] + self.lam[i, p] - 1)
-                self.model.addConstr(self.o_u[i, p] <= self.u[i])
-                self.model.addConstr(self.o_u[i, p] <= self.lam[i, p])
+                self._add_constr(self.o_u[i, p], GRB.GREATER_EQUAL, self.u[i] + self.lam[i, p] - 1)
+                self._add_constr(self.o_u[i, p], GRB.LESS_EQUAL, self.u[i])
+                self._add_constr(self.o_u[i, p], GRB.LESS_EQUAL, self.lam[i, p])
         for i in self.I:
-            self.model.addConstr(gp.quicksum(self.o_u[i, p] for p in self.P) <= 1)
+            self._add_constr(gp.quicksum(self.o_u[i, p] for p in self.P), GRB.LESS_EQUAL, 1)
 
         # explanation budget
-        self.model.addConstr(
-            (self.inp.max_weight+1)*gp.quicksum(1 - self.u[i] for i in self.I) +
-            gp.quicksum(self.inp.predicates[p].weight * self.o_u[i, p] for i in self.I for p in self.P)
-            <= self.MAX_EXPLANATION
-        )
+        self._add_constr(self.explainability_expr(), GRB.LESS_EQUAL, self.MAX_EXPLANATION)
+
+    def symmetry_breaking_constraints(self):
+        '''
+        Relabelling the nodes of a diagram in any order that keeps every arc pointing to a larger node gives the same (e, c), so
+        only one representative is kept:
+            - the active nodes are root, root+1, ..., i.e. u[i] >= u[i+1] (the active nodes are relabelled in their current order)
+            - an inactive node has the first predicate and sends all its buckets to the leaf L0
+        NOTE: orderings of the children by bucket or of siblings by predicate are not valid here, a child can be shared by several
+        parents / buckets and the arcs fix the relative order of the nodes on a path
+        '''
+        for i in self.I:
+            if i >= self.root and i + 1 in self.I:
+                self._add_constr(self.u[i], GRB.GREATER_EQUAL, self.u[i + 1], name="active_prefix")
+        for i in self.I:
+            if i != self.root:
+                self._add_constr(self.lam[i, 0], GRB.GREATER_EQUAL, 1 - self.u[i], name="inactive_predicate")
+                for c in range(self.B_P(0)):
+                    self._add_constr(self.tau[i, c, "L0"], GRB.GREATER_EQUAL, 1 - self.u[i], name="inactive_transition")
 
     def _build_constraints(self):
         if self._built:
             return
-        self.tree_constraints()
-        self.sample_constraints()
-        self.reachability_constraints()
+        self.model.update() # the presolved build addresses the variables by their column index
+        if self.build_mode == "matrix":
+            Matrix_Builder(self).build()
+        else:
+            self.tree_constraints()
+            self.sample_constraints()
+            self.reachability_constraints()
+            if self.symmetry_breaking:
+                self.symmetry_breaking_constraints()
+        self._add_bound_rows()
         self._built = True
 
+    def _add_bound_rows(self):
+        '''
+        adds the four rows bounding the box of solve() and sets the objective, both only once:
+        solve() only changes the right hand sides, so gurobi can reuse the previous basis / solution between the boxes.
+        An open side of the box gets a right hand side that the row can never reach (see _e_range, _c_range).
+        '''
+        e_expr = self.explainability_expr()
+        self._e_constant = e_expr.getConstant() # the rows hold e - _e_constant
+        e_expr.addConstant(-self._e_constant)
+        c_expr = gp.quicksum(self.weights[s]*self.m[self.root, s] for s in self.S) # = c * N_SAMPLES
+        coeffs = [e_expr.getCoeff(k) for k in range(e_expr.size())] # all variables are in [0,1]
+        self._e_range = (sum(a for a in coeffs if a < 0) - 1.0, sum(a for a in coeffs if a > 0) + 1.0)
+        self._c_range = (-1.0, self.N_SAMPLES + 1.0)
+        self._bound_rows = {
+            "e_lower": self.model.addLConstr(e_expr, GRB.GREATER_EQUAL, self._e_range[0], name="bound_e_lower"),
+            "e_upper": self.model.addLConstr(e_expr, GRB.LESS_EQUAL, self._e_range[1], name="bound_e_upper"),
+            "c_lower": self.model.addLConstr(c_expr, GRB.GREATER_EQUAL, self._c_range[0], name="bound_c_lower"),
+            "c_upper": self.model.addLConstr(c_expr, GRB.LESS_EQUAL, self._c_range[1], name="bound_c_upper"),
+        }
+        self._objective_exprs = (e_expr, c_expr)
+        self._set_objective()
+
+    def _set_objective(self):
+        e_expr, c_expr = self._objective_exprs
+        w_e, w_c = self.objective_weights
+        self.model.setObjective(w_e*(e_expr + self._e_constant) + w_c*c_expr, GRB.MAXIMIZE)
+
+    def set_objective_weights(self, w_e = 1.0, w_c = 1.0):
+        '''
+        the objective becomes w_e*e + w_c*N*c (the default is e + N*c), kept for all the following solves
+        '''
+        self.objective_weights = (w_e, w_c)
+        if self._built:
+            self._set_objective()
+
+    def set_box(self, e_l, e_u, c_l, c_u):
+        '''
+        moves the bound rows to the box e_l <= e <= e_u, c_l <= c <= c_u (None = open side)
+        '''
+        self._bound_rows["e_lower"].RHS = (e_l - self._e_constant) if e_l is not None else self._e_range[0]
+        self._bound_rows["e_upper"].RHS = (e_u - self._e_constant) if e_u is not None else self._e_range[1]
+        self._bound_rows["c_lower"].RHS = c_l*self.N_SAMPLES if c_l is not None else self._c_range[0]
+        self._bound_rows["c_upper"].RHS = c_u*self.N_SAMPLES if c_u is not None else self._c_range[1]
+
     def solve(self, e_l , e_u , c_l , c_u ):
-        #TODO: remove all the old constraints
-        old_cons = [c for c in self.model.getConstrs() if c.ConstrName and c.ConstrName.startswith("temp_")]
-        if old_cons:
-            self.model.remove(old_cons)
-            self.model.update()
-        #adding all the fixed constraints
+        #adding all the fixed constraints (and the bound rows, only the first time)
         self._build_constraints()
-        # self.model.addConstr(self.m[0,1] == 1)
-        #adding the new constraints
-        if e_l is not None:
-            self.model.addConstr((self.inp.max_weight+1)*gp.quicksum(1 - self.u[i] for i in self.I) +
-            gp.quicksum(self.inp.predicates[p].weight * self.o_u[i, p] for i in self.I for p in self.P) >= e_l , name = "temp_e_lower")
-        if e_u is not None:
-            self.model.addConstr((self.inp.max_weight+1)*gp.quicksum(1 - self.u[i] for i in self.I) +
-            gp.quicksum(self.inp.predicates[p].weight * self.o_u[i, p] for i in self.I for p in self.P) <= e_u , name = "temp_e_upper")
-        if c_l is not None:
-            self.model.addConstr(gp.quicksum(self.m[self.root, s] for s in self.S) >= c_l*len(self.S) , name = "temp_c_lower")
-        if c_u is not None:
-            self.model.addConstr(gp.quicksum(self.m[self.root, s] for s in self.S) <= c_u*len(self.S) , name = "temp_c_upper")
-        self.model.setObjective(
-            (self.inp.max_weight+1)*gp.quicksum(1 - self.u[i] for i in self.I) +
-            gp.quicksum(self.inp.predicates[p].weight * self.o_u[i, p] for i in self.I for p in self.P) +
-            gp.quicksum(self.m[self.root, s] for s in self.S),
-            GRB.MAXIMIZE
-        )
+        start = time.perf_counter()
+        self.set_box(e_l, e_u, c_l, c_u)
         diagram_path = None
         self.model.update()
+        self.last_overhead = time.perf_counter() - start # time spent on the box itself, next to model.Runtime
         # self.model.write(f"I_{self.inp.max_nodes}_int_nodes_{self._int_tag}.lp") 
-        self.model.optimize()
-        if self.model.Status == GRB.OPTIMAL:
+        self.model.optimize(self.optimize_callback)
+        if self.model.Status == GRB.OPTIMAL and self.save_diagram:
             for v in self.model.getVars():
                 if (v.VarName.startswith("o_u") or v.VarName.startswith("u") or v.VarName.startswith("m") or v.VarName.startswith("lam") or v.VarName.startswith("tau")) :
                     print(f"{v.VarName} = {v.X}") 
@@ -284,12 +520,14 @@ class Encoding:
             "m": self.m,
             "b": self.b,
             "d": self.d,
+            "f": self.f,
             "z_u": self.z_u,
             "I": list(self.I),
             "P": list(self.P),
             "C": list(self.C),
             "L": self.L,
             "S": list(self.S),
+            "weights": self.weights,
             "model": self.model,
             "diagram_path": diagram_path
         }
@@ -311,7 +549,7 @@ class Encoding:
             for c in self.C:
                 for j in all_nodes:
                     if node_order(j) > i:
-                        val = float(self.tau[i, c, j].X)
+                        val = value(self.tau[i, c, j])
                         if val >= edge_threshold:
                             edges.append((i, j, c, val))
 
@@ -321,7 +559,7 @@ class Encoding:
             lines = [str(i)]
             for p in self.P:
                 pname = self.inp.predicates[p].pred_name
-                lines.append(f"{pname}({float(self.lam[i, p].X):.2f})")
+                lines.append(f"{pname}({value(self.lam[i, p]):.2f})")
             node_label[i] = "\n".join(lines)
         for leaf_key, leaf_val in self.L.items():
             node_label[leaf_key] = f"{leaf_key}\n{leaf_val}"
@@ -417,11 +655,27 @@ class Encoding:
             print("There is no path to save the image in")
             plt.show() #removed because there is no display in cn07
     
+    def pool_points(self):
+        '''
+        returns [(c, e)] of every solution in the solution pool of the last optimize() (read from the bound rows, see _add_bound_rows())
+        '''
+        e_row = self.model.getRow(self._bound_rows["e_lower"])
+        c_row = self.model.getRow(self._bound_rows["c_lower"])
+        e_vars = [e_row.getVar(k) for k in range(e_row.size())]
+        c_vars = [c_row.getVar(k) for k in range(c_row.size())]
+        points = []
+        for n in range(self.model.SolCount):
+            self.model.Params.SolutionNumber = n
+            e = self._e_constant + sum(e_row.getCoeff(k)*x for k, x in enumerate(self.model.getAttr("Xn", e_vars)))
+            c = sum(c_row.getCoeff(k)*x for k, x in enumerate(self.model.getAttr("Xn", c_vars)))/self.N_SAMPLES
+            points.append((c, e))
+        return points
+
     def calculate_explainability(self):
-        return (self.inp.max_weight+1)*sum(1-self.u[i].X for i in self.I) + sum(self.inp.predicates[p].weight*self.o_u[i,p].X for i in self.I for p in self.P)
+        return (self.inp.max_weight+1)*(self.num_pruned_nodes + sum(1-value(self.u[i]) for i in self.I)) + sum(self.inp.predicates[p].weight*value(self.o_u[i,p]) for i in self.I for p in self.P)
     
     def calculate_correctness(self):
-        return sum(self.m[self.root, s].X for s in self.S)*1.0/len(self.S)
+        return sum(self.weights[s]*value(self.m[self.root, s]) for s in self.S)*1.0/self.N_SAMPLES
         # return sum(self.m[self.root, s].X for s in self.S)*1.0
 
 
@@ -0,0 +1,158 @@
+from parallel_boxes import find_pareto_points_parallel
+
+'''
+Enumerators of the Pareto front, all behind enumerate_front(pp, method). They record the points in pp.pareto_points,
+so cumulate_pareto_points() writes the same CSV and plot whatever the method, and pp.milp_calls counts the solves.
+
+divide_and_conquer - the original search: maximize e + N*c in a box, split the box at the point (Pareto_Points.find_pareto_points())
+epsilon_constraint - sweep over the correctness levels: the lexicographic maximum (e first, then c) among c >= c_l, then c_l = c + C_QUANT;
+                     one solve per point and a single infeasible one at the end
+balanced_box - rectangles between two known points are split at half their c range; the lexicographic best e in the
+               upper half and the best c in the lower half (above that point) give the next points (Boland, Charkhgard, Savelsbergh)
+two_phase - first the supported points by weighted sums between neighbouring supported points (dichotomic search),
+            then the unsupported points left in each rectangle by divide and conquer
+
+e moves in steps of 1 and N*c in steps of one sample, so lexicographic orders are single weighted objectives
+(e first: (N+1)*e + N*c, c first: e + (e range + 1)*N*c), solved with an absolute MIP gap below 1.
+'''
+
+METHODS = ("divide_and_conquer", "epsilon_constraint", "balanced_box", "two_phase")
+LEX_GAP_ABS = 0.5 # the weighted objectives are integral, a gap below 1 proves the optimum
+
+
+def _solve(pp, box, weights):
+    '''
+    returns the solve_box() result of the box (e_l, e_u, c_l, c_u) maximizing w_e*e + w_c*N*c, None if it is empty
+    '''
+    box = pp.prune_box((*box, None))
+    if box is None:
+        return None
+    enc = pp.enc
+    gap, gap_abs = enc.model.Params.MIPGap, enc.model.Params.MIPGapAbs
+    enc.set_objective_weights(*weights)
+    enc.model.Params.MIPGap = 0.0
+    enc.model.Params.MIPGapAbs = LEX_GAP_ABS
+    try:
+        result = pp.solve_box(*box[:4])
+    finally:
+        enc.set_objective_weights()
+        enc.model.Params.MIPGap = gap
+        enc.model.Params.MIPGapAbs = gap_abs
+    if result is None and pp.last_status == "time_limit":
+        # the enumerators do not search a box again, the region stays open (see Pareto_Points.split_timed_out())
+        pp.flagged_boxes.append(box[:4])
+    return result
+
+
+def lexicographic(pp, box, first):
+    '''
+    returns the solve_box() result of the lexicographic maximum of the box, first = "e" (then c) or "c" (then e)
+    '''
+    enc = pp.enc
+    if first == "e":
+        weights = (enc.N_SAMPLES + 1.0, 1.0)
+    else:
+        enc._build_constraints() # _e_range is known once the bound rows exist
+        weights = (1.0, enc._e_range[1] - enc._e_range[0] + 1.0)
+    return _solve(pp, box, weights)
+
+
+def _extremes(pp):
+    '''
+    records and returns the two ends of the front (best e, best c), the second is None if the front is a single point
+    '''
+    Q = pp.enc.C_QUANT
+    top = lexicographic(pp, (None, None, None, None), "e")
+    if top is None:
+        return None, None
+    pp.record_point(top)
+    bottom = lexicographic(pp, (None, top["e"] - 1, top["c"] + Q, None), "c")
+    if bottom is not None:
+        pp.record_point(bottom)
+    return top, bottom
+
+
+def divide_and_conquer(pp):
+    if pp.workers > 1:
+        find_pareto_points_parallel(pp)
+    else:
+        pp.find_pareto_points(None, None, None, None)
+
+
+def epsilon_constraint(pp):
+    Q = pp.enc.C_QUANT
+    c_l, e_u = None, None
+    while True:
+        # a point with more correctness than the last one has less explainability
+        result = lexicographic(pp, (None, e_u, c_l, None), "e")
+        if result is None:
+            return
+        pp.record_point(result)
+        c_l, e_u = result["c"] + Q, result["e"] - 1
+
+
+def balanced_box(pp):
+    Q = pp.enc.C_QUANT
+    top, bottom = _extremes(pp)
+    if bottom is None:
+        return
+    rectangles = [(top, bottom)]
+    while rectangles:
+        z1, z2 = rectangles.pop()
+        # the points strictly between z1 (best e) and z2 (best c)
+        steps = round((z2["c"] - z1["c"]) / Q)
+        if steps < 2 or z1["e"] - z2["e"] < 2:
+            continue
+        c_mid = z1["c"] + (steps // 2) * Q
+        a = lexicographic(pp, (z2["e"] + 1, z1["e"] - 1, c_mid, z2["c"] - Q), "e")
+        if a is not None:
+            pp.record_point(a)
+        b = lexicographic(pp, ((a if a is not None else z2)["e"] + 1, z1["e"] - 1, z1["c"] + Q, c_mid - Q), "c")
+        if b is not None:
+            pp.record_point(b)
+        # nothing lies between b and a: b has the best c of the upper half above a, a the best e of the lower half
+        if b is not None:
+            rectangles.append((z1, b))
+        if a is not None:
+            rectangles.append((a, z2))
+
+
+def two_phase(pp):
+    Q = pp.enc.C_QUANT
+    N = pp.enc.N_SAMPLES
+    top, bottom = _extremes(pp)
+    if bottom is None:
+        return
+    # phase 1: weighted sums normal to the segment between two neighbouring supported points
+    segments = [(top, bottom)]
+    remaining = [] # (rectangle, point found in it on or below the segment)
+    while segments:
+        p, q = segments.pop()
+        rectangle = (q["e"] + 1, p["e"] - 1, p["c"] + Q, q["c"] - Q)
+        w_e, w_c = round((q["c"] - p["c"]) * N), p["e"] - q["e"] # w_e*e + w_c*N*c is the same at p and q
+        r = _solve(pp, rectangle, (w_e, w_c))
+        if r is None:
+            continue
+        pp.record_point(r)
+        if w_e*r["e"] + w_c*N*r["c"] > w_e*p["e"] + w_c*N*p["c"] + LEX_GAP_ABS:
+            segments += [(p, r), (r, q)]
+        else:
+            remaining.append((rectangle, r))
+    # phase 2: the rest of the front is unsupported, it lies in the rectangles next to the points on the segments
+    for rectangle, r in remaining:
+        for box in pp.child_boxes(*rectangle, r["c"], r["e"]):
+            pp.find_pareto_points(*box)
+
+
+ENUMERATORS = {
+    "divide_and_conquer": divide_and_conquer,
+    "epsilon_constraint": epsilon_constraint,
+    "balanced_box": balanced_box,
+    "two_phase": two_phase,
+}
+
+
+def enumerate_front(pp, method="divide_and_conquer"):
+    if method not in ENUMERATORS:
+        raise ValueError(f"unknown method {method!r}, expected one of {METHODS}")
+    ENUMERATORS[method](pp)
@@ -1,38 +1,118 @@
 import os
 import pandas as pd
 import sys
-# import numpy as np
+import numpy as np
+from conditions import Bucket_Table, referenced_names
+from cache import Input_Cache
+
+try:
+    import numexpr  # noqa: F401 (only needed by pandas eval)
+    EVAL_ENGINE = "numexpr"
+except ImportError:
+    EVAL_ENGINE = "python"
+
+
+def evaluate_derived_features(df, derived_features, engine=EVAL_ENGINE):
+    '''
+    This function evaluates all the derived features "<name> = <expression>" in one multi-line DataFrame.eval (later expressions may use earlier ones)
+    and returns the frame with the new columns. numexpr is used when it is installed, expressions it does not support are evaluated with the python engine.
+    '''
+    if not derived_features:
+        return df
+    program = "\n".join(f"{new_feature} = {expression}" for new_feature, expression in derived_features)
+    try:
+        return df.eval(program, engine=engine)
+    except (NotImplementedError, TypeError, ValueError):
+        if engine == "python":
+            raise
+        return df.eval(program, engine="python")
+
 
 class Samples:
     '''
     Instance attributes:
         dir_path(str) - stores the path of the folder which holds the sampels.csv file
-        samples(csv) - stores all the samples
+        samples(csv) - stores all the samples (None when samples.csv is read in chunks)
         updated_samples(csv) - stores the updated samples after processing the features 
-        features(DataFrame) - stores all the feature values for samples
+        features(DataFrame) - all the feature values for samples (a view of updated_samples without the label, no copy is made)
         output(csv) - stores all the outputs(last column of samples.csv)
 
     NOTE:
     This code assumes that there is a column named label which has the output values, it does not necessarily need to be at the very end.
     All changes are made in updated_samples
+    If chunksize is given, samples.csv is read in typed chunks (numeric columns as float64, label as a categorical), the derived features are
+    evaluated chunk by chunk and only the columns in keep_columns (plus label) are kept.
     '''
-    def __init__(self, samples_csv_path:str):
+    def __init__(self, samples_csv_path:str, derived_features=(), chunksize=None, keep_columns=None):
         # self.dir_path = samples_csv_path.replace("samples.csv","")
         self.dir_path = os.path.dirname(samples_csv_path) # initializing the directory path
-        df = pd.read_csv(samples_csv_path, skipinitialspace=True) #reading samples.csv
-        self.samples = df
-        self.updated_samples = self.samples.copy() #making a copy of samples.csv in updated_samples
+        if chunksize is None:
+            df = pd.read_csv(samples_csv_path, skipinitialspace=True) #reading samples.csv
+            self.samples = df
+            self.updated_samples = self.samples.copy() #making a copy of samples.csv in updated_samples
+            self.add_derived_features(derived_features)
+        else:
+            self.samples = None
+            self.updated_samples = self.read_chunks(samples_csv_path, derived_features, chunksize, keep_columns)
         self.put_label_at_end() #finds out the column with the name "label" and puts it at the end
-        self.features = self.updated_samples.iloc[:,:-1].copy() #initializing feature values
         self.output = self.updated_samples.iloc[:,-1].copy() #initializzing output values
 
+    @property
+    def features(self):
+        return self.updated_samples.iloc[:,:-1]
+
+    def read_chunks(self, samples_csv_path, derived_features, chunksize, keep_columns):
+        '''
+        This function reads samples.csv chunk by chunk and returns the concatenated updated samples.
+        Only the columns needed to compute keep_columns are read, and derived features nobody refers to are skipped.
+        '''
+        header = pd.read_csv(samples_csv_path, skipinitialspace=True, nrows=1000) # used to fix the column types of every chunk
+        needed = set(header.columns) if keep_columns is None else set(keep_columns)
+        derived_needed = []
+        for new_feature, expression in reversed(list(derived_features)):
+            if new_feature in needed:
+                needed |= referenced_names(expression)
+                derived_needed.append((new_feature, expression))
+        derived_needed.reverse()
+        usecols = [col for col in header.columns if col in needed or col == "label"]
+        dtypes = {col: np.float64 for col in usecols if col != "label" and pd.api.types.is_numeric_dtype(header[col])}
+        if "label" in usecols:
+            dtypes["label"] = header["label"].dtype if pd.api.types.is_numeric_dtype(header["label"]) else object
+        chunks = []
+        for chunk in pd.read_csv(samples_csv_path, skipinitialspace=True, chunksize=chunksize, usecols=usecols, dtype=dtypes):
+            chunk = evaluate_derived_features(chunk, derived_needed)
+            if keep_columns is not None:
+                chunk = chunk[[col for col in chunk.columns if col in keep_columns or col == "label"]]
+            chunks.append(chunk)
+        if not chunks:
+            return header.iloc[:0]
+        if "label" in usecols:
+            # giving every chunk the same categories, otherwise concat falls back to object
+            categories = pd.api.types.union_categoricals([chunk["label"].astype("category") for chunk in chunks]).categories
+            for chunk in chunks:
+                chunk["label"] = pd.Categorical(chunk["label"], categories=categories)
+        return pd.concat(chunks, ignore_index=True)
+
     def update_samples(self, new_feature, expression , engine):
         '''
         This function adds a column based on the expression we give and puts the "label" column at the end of the samples.csv
         '''
         self.updated_samples[new_feature] = self.updated_samples.eval(expression, engine= engine) #creating a new column with new feature
         self.put_label_at_end()
-        self.features = self.updated_samples.iloc[:,:-1].copy() #updating self.features
+
+    def add_derived_features(self, derived_features, engine=EVAL_ENGINE):
+        '''
+        This function adds all the derived features (list of (name, expression)) in one vectorized pass and puts the "label" column at the end
+        '''
+        self.updated_samples = evaluate_derived_features(self.updated_samples, list(derived_features), engine)
+        self.put_label_at_end()
+
+    def add_feature_values(self, new_feature, values):
+        '''
+        This function adds a column with already computed values (e.g. a derived feature loaded from the cache) and puts the "label" column at the end
+        '''
+        self.updated_samples[new_feature] = values
+        self.put_label_at_end()
 
     def put_label_at_end(self):
         '''
@@ -62,6 +142,7 @@ class Predicate:
         num_buckets: stores the number of buckets allowed by that feature
         weight: Stores the weight assosciated with that predicate
         conditions(list): stores the conditions assosciated with each predicate
+        table(Bucket_Table): stores the compiled form of conditions (None until Input.compile_predicates() is called)
 
     '''
     def __init__(self , name ,pred_id , num_buckets , weight):
@@ -70,6 +151,7 @@ class Predicate:
         self.num_buckets = num_buckets #initializing number of buckets
         self.weight = weight #initializing weight
         self.conditions = [] #initializing conditions list as empty initially
+        self.table = None
 
 
 class Input:
@@ -77,32 +159,136 @@ class Input:
     instance attributes:
       filename (str) - stores the filename which has samples.csv and features.txt (for examples, "examples/wine")
       max_nodes (int) - stores the maximum number of internal nodes possible as inputted by the user
-      samples (Samples) - stores all info related to samples.csv
+      samples (Samples) - stores all info related to samples.csv (read lazily when the preprocessed input comes from the cache)
+      derived_features (list[tuple]) - stores the (name, expression) of every derived feature of features.txt
       predicates (list[Predicate]) - contains a list of predicates (along with their details)
       c_max (int) - stores the maximum number of branches possible ( calculated from features.txt)
       leaves (list[str]) - stores the leaves of the decision diagram
+      membership (np.ndarray) - uint8 array of shape (|S|, |P|, c_max), membership[s,p,c] = 1 iff sample s falls in bucket c of predicate p
+      label_idx (np.ndarray) - array of shape (|S|,), label_idx[s] is the position of the label of sample s in leaves
+      buckets_validated (bool) - True if the buckets of every predicate are proven to be pairwise disjoint and to cover the whole range
+      num_samples (int) - stores the number of samples in samples.csv
+      class_weights (np.ndarray) - number of samples in every (bucket signature, label) class, shape (|K|,)
+      class_membership (np.ndarray) - membership of a representative of every class, shape (|K|, |P|, c_max)
+      class_label_idx (np.ndarray) - label_idx of a representative of every class, shape (|K|,)
+      sample_class (np.ndarray) - class of every sample, shape (|S|,)
 
       NOTE:
       Currently there is a restriction that maximum weight is less that 20000000000(aribitrarily chosen large number for now)
+      With use_cache = True the preprocessed input is stored in <filename>/.cache (see cache.py), repeated runs on the same samples.csv and
+      features.txt skip reading and parsing entirely, and updated_samples.csv is only rewritten when the inputs have changed.
+      With chunksize given, samples.csv is read in chunks of that many rows and only the columns the predicates refer to are kept (see Samples).
+      Such a run has its own cache entry, which holds only the derived columns the predicates refer to.
     '''
-    def __init__(self, filename, max_nodes, MAX_WEIGHT = 20000000000):
+    def __init__(self, filename, max_nodes, MAX_WEIGHT = 20000000000, dedup_samples = True, use_cache = True, chunksize = None):
         self.filename = filename #initializing filename
         self.max_nodes = max_nodes #initializing max_nodes
-        self.samples = Samples(os.path.join(self.filename, "samples.csv")) #making an object of the class Samples
+        self.dedup_samples = dedup_samples
+        self._samples = None
+        self._cached_columns = {}
+        self.derived_features = []
         self.predicates = [] #initializing the list of predicates(starting with empty)
         self.c_max = 0
         self.leaves = []
         self.max_weight = 0
         self.min_weight = MAX_WEIGHT
-        self.read_features() # predicates[] updated
+        self.buckets_validated = False
+        cache = Input_Cache(self.filename, f"MAX_WEIGHT={MAX_WEIGHT};dedup_samples={dedup_samples};chunked={chunksize is not None}") if use_cache else None
+        cached = cache.load() if cache is not None else None
+        if cached is not None:
+            self.load_from_cache(*cached)
+            return
+        self.read_features() # predicates[] and derived_features[] updated
+        self._samples = Samples(
+            os.path.join(self.filename, "samples.csv"), self.derived_features,
+            chunksize=chunksize, keep_columns=None if chunksize is None else self.referenced_columns()
+        ) #making an object of the class Samples (derived features are added in one pass)
+        self.compile_predicates()
         self.samples.put_label_at_end() 
         self.calculate_c_max() 
         self.calculate_leaves()
+        self.calculate_membership()
+        self.calculate_sample_classes()
         self.samples.save_updated_samples()
-        # self.samples.updated_samples.to_csv(
-        #     os.path.join(self.filename, "updated_samples.csv"),
-        #     index=False
-        # )
+        if cache is not None:
+            cache.save(*self.cache_entry())
+
+    @property
+    def samples(self):
+        '''
+        The Samples object is only built when it is needed. With a cache hit the derived features are taken from the cache instead of being evaluated again.
+        '''
+        if self._samples is None:
+            self._samples = Samples(os.path.join(self.filename, "samples.csv"))
+            for new_feature, values in self._cached_columns.items():
+                self._samples.add_feature_values(new_feature, values)
+            self._samples.add_derived_features([x for x in self.derived_features if x[0] not in self._cached_columns])
+        return self._samples
+
+    def referenced_columns(self):
+        '''
+        This function returns the set of columns the bucket conditions of the predicates refer to
+        '''
+        columns = set()
+        for pred in self.predicates:
+            for condition in pred.conditions:
+                columns |= referenced_names(condition)
+        return columns
+
+    def cache_entry(self):
+        '''
+        This function returns the (metadata, arrays) pair stored in the cache: derived columns, predicate metadata and membership matrices.
+        '''
+        meta = {
+            "predicates": [
+                {"name": p.pred_name, "pred_id": p.pred_id, "num_buckets": p.num_buckets, "weight": p.weight, "conditions": p.conditions}
+                for p in self.predicates
+            ],
+            "derived_features": self.derived_features,
+            "leaves": [x.item() if isinstance(x, np.generic) else x for x in self.leaves],
+            "c_max": self.c_max,
+            "max_weight": self.max_weight,
+            "min_weight": self.min_weight,
+            "buckets_validated": self.buckets_validated,
+            "num_samples": self.num_samples,
+        }
+        arrays = {
+            "membership": self.membership,
+            "label_idx": self.label_idx,
+            "class_weights": self.class_weights,
+            "class_membership": self.class_membership,
+            "class_label_idx": self.class_label_idx,
+            "sample_class": self.sample_class,
+        }
+        df = self.samples.updated_samples
+        for new_feature, _ in self.derived_features:
+            # a chunked read skips the derived features no predicate refers to, the samples property recomputes them
+            if new_feature in df.columns and pd.api.types.is_numeric_dtype(df[new_feature]):
+                arrays[f"derived__{new_feature}"] = df[new_feature].to_numpy()
+        return meta, arrays
+
+    def load_from_cache(self, meta, arrays):
+        '''
+        This function restores everything computed by the constructor from a cache entry (see cache_entry()).
+        '''
+        for p in meta["predicates"]:
+            pred = Predicate(name=p["name"], pred_id=p["pred_id"], num_buckets=p["num_buckets"], weight=p["weight"])
+            pred.conditions = p["conditions"]
+            self.predicates.append(pred)
+        self.derived_features = [tuple(x) for x in meta["derived_features"]]
+        self.leaves = meta["leaves"]
+        self.c_max = meta["c_max"]
+        self.max_weight = meta["max_weight"]
+        self.min_weight = meta["min_weight"]
+        self.buckets_validated = meta["buckets_validated"]
+        self.num_samples = meta["num_samples"]
+        self.membership = arrays["membership"]
+        self.label_idx = arrays["label_idx"]
+        self.class_weights = arrays["class_weights"]
+        self.class_membership = arrays["class_membership"]
+        self.class_label_idx = arrays["class_label_idx"]
+        self.sample_class = arrays["sample_class"]
+        self._cached_columns = {name[len("derived__"):]: values for name, values in arrays.items() if name.startswith("derived__")}
 
     def calculate_c_max(self):
         '''
@@ -120,9 +306,65 @@ class Input:
         # last_col = df.columns[-1]
         self.leaves = pd.unique(df).tolist()
 
+    def compile_predicates(self):
+        '''
+        This function compiles the conditions of every predicate into a Bucket_Table and checks (at load time) that the buckets
+        are pairwise disjoint and cover the whole range. Predicates failing the check still work (their conditions are evaluated
+        with DataFrame.eval), but a warning is printed and buckets_validated is set to False.
+        '''
+        self.buckets_validated = True
+        for pred in self.predicates:
+            pred.table = Bucket_Table(pred.conditions[:pred.num_buckets])
+            problems = list(pred.table.problems)
+            if len(pred.conditions) != pred.num_buckets:
+                problems.append(f"{len(pred.conditions)} conditions are given for {pred.num_buckets} buckets")
+            if problems:
+                self.buckets_validated = False
+                print(f"WARNING: buckets of predicate {pred.pred_name} are not a partition: {'; '.join(problems)}", file=sys.stderr)
+
+    def calculate_membership(self):
+        '''
+        This function buckets the whole updated_samples once per predicate (one np.searchsorted call for interval predicates,
+        one vectorized eval per condition otherwise) and stores the result in membership, so that func() becomes an array lookup.
+        It also stores label_idx, the position of the label of each sample in leaves.
+        '''
+        df = self.samples.updated_samples
+        self.membership = np.zeros((len(df), len(self.predicates), self.c_max), dtype=np.uint8)
+        for pred in self.predicates:
+            buckets = pred.table.bucketize(df)
+            self.membership[:, pred.pred_id, :buckets.shape[1]] = buckets
+        self.label_idx = pd.Index(self.leaves).get_indexer(self.samples.output)
+
+    def calculate_sample_classes(self):
+        '''
+        This function collapses the samples that have the same bucket signature (membership over all predicates) and the same label
+        into one class weighted by the number of samples in it. Samples in the same class are indistinguishable for every decision
+        diagram, so the encoding only needs one row per class.
+        If dedup_samples is False, every sample is its own class of weight 1.
+        '''
+        self.num_samples = len(self.label_idx)
+        if self.dedup_samples and self.num_samples > 0:
+            signature = np.concatenate([self.membership.reshape(self.num_samples, -1).astype(np.int64), self.label_idx[:, None]], axis=1)
+            _, class_rep, sample_class, counts = np.unique(signature, axis=0, return_index=True, return_inverse=True, return_counts=True)
+            sample_class = sample_class.reshape(-1)
+            # numbering the classes in order of their first sample
+            order = np.argsort(class_rep)
+            rank = np.empty_like(order)
+            rank[order] = np.arange(len(order))
+            class_rep = class_rep[order]
+            self.class_weights = counts[order]
+            self.sample_class = rank[sample_class]
+        else:
+            class_rep = np.arange(self.num_samples)
+            self.class_weights = np.ones(self.num_samples, dtype=np.int64)
+            self.sample_class = np.arange(self.num_samples)
+        self.class_membership = self.membership[class_rep]
+        self.class_label_idx = self.label_idx[class_rep]
+
     def read_features(self):
         '''
-        This function reads features.txt and updates the list predicates and also adds. new columns in updated_samples (if required)
+        This function reads features.txt and updates the list predicates and the list derived_features (the new columns are added
+        to updated_samples in one pass when Samples is built)
         '''
         # df = self.samples.updated_samples
         pred_id = 0
@@ -158,9 +400,8 @@ class Input:
                 new_feature, expression = line.split("=")
                 new_feature = new_feature.strip()
                 expression = expression.strip()
-                # evaluate using existing columns (including previously derived ones)
-                # df[new_feature] = df.eval(expression, engine="python")
-                self.samples.update_samples(new_feature, expression, engine="python")
+                # evaluated later using existing columns (including previously derived ones)
+                self.derived_features.append((new_feature, expression))
 
             else:
                 # bucket condition line 
@@ -188,22 +429,15 @@ class Input:
     def func(self, sample_id , pred_id, bucket_id = -1):
         '''
         returns 1 if a particular sample sample_id would take a bucket bucket_id when evaluated through the predicate pred_id
-        if bucket_id = -1, that means we are evaluating a sample at one of the leaves, in that case the function returns true when the label of the sample is same as the label of the leaf'''
-        df = self.samples.updated_samples
-        curr_s = df.iloc[sample_id]
+        if bucket_id = -1, that means we are evaluating a sample at one of the leaves, in that case the function returns true when the label of the sample is same as the label of the leaf
+        The values are read from membership and label_idx (see calculate_membership())'''
         if bucket_id >= 0:
-            # if bucket_id < self.predicates[pred_id].num_buckets and bucket_id < len(self.predicates[pred_id].conditions): 
             if bucket_id < self.predicates[pred_id].num_buckets: 
-                condition = (self.predicates[pred_id].conditions)[bucket_id]
-                result = eval(condition,{}, curr_s.to_dict())
-                if result == True:
-                    return 1
-                else:
-                    return 0
+                return int(self.membership[sample_id, pred_id, bucket_id])
             else:
                 return 0
         else:
-            if curr_s["label"] == pred_id: # here pred_id refers to leaf id as this is the leaf case
+            if self.leaves[self.label_idx[sample_id]] == pred_id: # here pred_id refers to leaf id as this is the leaf case
                 return 1
             else:
                 return 0
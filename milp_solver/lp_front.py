@@ -0,0 +1,148 @@
+import os
+import csv
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from gurobipy import GRB
+
+
+'''
+Pareto front of the all-continuous encoding (LP_Relaxation.all_continuous(parametric=True)) by one parametric LP.
+
+When no variable is integral every box of the divide and conquer is an LP and the front is the concave
+piecewise-linear curve U(t) = max e subject to N*c >= t. It is walked along the right hand side t of the c_lower
+bound row of the Encoding (see Encoding._add_bound_rows()) instead of solving a box per point:
+    the basis optimal at t stays optimal up to t_up = SARHSUp of the row, and on [t, t_up] U is linear with slope Pi (the dual of the row)
+    so (t_up / N, U(t) + Pi*(t_up - t)) is the next breakpoint, and the row is moved just past it (RHS_STEP) and the LP reoptimised
+The model is solved with the dual simplex, which restarts from the previous basis after a change of right hand side,
+so every breakpoint costs a few pivots. The walk stops when the LP gets infeasible (no larger c) or t reaches N.
+The walk starts at the left end of the front: the right end of its flat part (max e, then max N*c at that e, two solves),
+flat parts (slope 0) and points on a straight segment are dropped at the end.
+NOTE: c and e are not rounded, the breakpoints of the LP are not on the correctness levels k/N
+'''
+
+RHS_STEP = 1e-6 # the row is moved this far (in samples) past a breakpoint to leave the basis of the segment
+TOL = 1e-7 # breakpoints closer than this (in c and in e) are the same
+
+
+class LP_Front:
+    '''
+    Instance attributes:
+        points(list) - the breakpoints (c, e) of the front by increasing c (decreasing e)
+        bases(list) - (VBasis, CBasis) of every breakpoint: the basis of the segment ending at it (of the first solve of the walk for the first one)
+        lp_solves(int) - number of reoptimisations
+        iterations(int) - sum of the simplex iterations
+        solve_time(float) - sum of the gurobi run times (seconds)
+    '''
+    def __init__(self):
+        self.points = []
+        self.bases = []
+        self.lp_solves = 0
+        self.iterations = 0
+        self.solve_time = 0.0
+
+    def _drop_inner_points(self):
+        '''
+        keeps the non-dominated breakpoints where the slope changes
+        '''
+        kept = []
+        for point, basis in zip(self.points, self.bases):
+            # a point with about the same c or at least the same e (with more c) replaces the previous ones
+            while kept and (kept[-1][0][1] <= point[1] + TOL or kept[-1][0][0] >= point[0] - TOL):
+                if kept[-1][0][1] > point[1] + TOL:
+                    point = kept[-1][0] # same c, the previous point has more e
+                kept.pop()
+            if len(kept) >= 2:
+                (c0, e0), (c1, e1) = kept[-2][0], kept[-1][0]
+                if abs((e1 - e0)*(point[0] - c0) - (point[1] - e0)*(c1 - c0)) <= TOL*max(1.0, abs(e0)):
+                    kept.pop()
+            kept.append((point, basis))
+        self.points = [point for point, _ in kept]
+        self.bases = [basis for _, basis in kept]
+
+
+def _optimize(model, front):
+    model.optimize()
+    front.lp_solves += 1
+    front.iterations += int(model.IterCount)
+    front.solve_time += model.Runtime
+    if model.Status not in (GRB.OPTIMAL, GRB.INFEASIBLE):
+        raise RuntimeError(f"the LP of the parametric front ended with status {model.Status}")
+
+
+def parametric_front(enc, max_steps=100000):
+    '''
+    returns the LP_Front of the Encoding enc, whose variables are all continuous
+    max_steps - most reoptimisations of the walk, a RuntimeError is raised if the front is not finished by then
+    '''
+    enc._build_constraints()
+    model = enc.model
+    model.update()
+    if model.IsMIP:
+        raise ValueError("the parametric front needs an all-continuous Encoding (no integral nodes)")
+    N = enc.N_SAMPLES
+    row = enc._bound_rows["c_lower"]
+    model.Params.Method = 1 # dual simplex: warm started from the previous basis
+    front = LP_Front()
+    try:
+        # the walk starts at the right end of the flat part of the front (lexicographic: max e, then max N*c at that e),
+        # from any other vertex of the flat part it would only move the row by RHS_STEP at a time through degenerate bases
+        enc.set_objective_weights(1.0, 0.0) # maximize e
+        enc.set_box(None, None, None, None)
+        _optimize(model, front)
+        if model.Status == GRB.INFEASIBLE:
+            raise RuntimeError("the LP of the parametric front is infeasible")
+        enc.set_box(model.ObjVal - TOL, None, None, None)
+        enc.set_objective_weights(0.0, 1.0) # maximize N*c
+        _optimize(model, front)
+        t = min(model.ObjVal, float(N))
+        enc.set_objective_weights(1.0, 0.0)
+        enc.set_box(None, None, t / N, None)
+        for _ in range(max_steps):
+            _optimize(model, front)
+            if model.Status == GRB.INFEASIBLE:
+                break
+            t = row.RHS
+            e, slope = model.ObjVal, row.Pi
+            basis = (model.getAttr("VBasis", model.getVars()), model.getAttr("CBasis", model.getConstrs()))
+            if not front.points:
+                # the right end of the flat part is the left end of the front
+                front.points.append((t / N, e))
+                front.bases.append(basis)
+            t_up = max(t, min(row.SARHSUp, float(N)))
+            front.points.append((t_up / N, e + slope*(t_up - t)))
+            front.bases.append(basis)
+            if t_up >= N:
+                break
+            row.RHS = t_up + RHS_STEP
+        else:
+            raise RuntimeError(f"the parametric front is not finished after max_steps = {max_steps} LP solves")
+    finally:
+        enc.set_objective_weights()
+        model.Params.Method = -1
+    front._drop_inner_points()
+    print(f"LP front: {len(front.points)} breakpoints, {front.lp_solves} LP solves, {front.iterations} simplex iterations")
+    return front
+
+
+def write_lp_front(front, enc):
+    '''
+    writes the breakpoints (lp_front_*.csv) and plots the front (lp_front_*.png) in the results of the Encoding enc
+    '''
+    inp = enc.inp
+    result_dir = os.path.join(inp.filename, "results", f"I_{inp.max_nodes}_int_nodes_{enc._int_tag}")
+    out_dir = os.path.join(result_dir, "pareto_points")
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, f"lp_front_I{inp.max_nodes}_C{inp.c_max}.csv"), "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["c", "e"])
+        w.writerows(front.points)
+    out_dir = os.path.join(result_dir, "pareto_curves")
+    os.makedirs(out_dir, exist_ok=True)
+    plt.figure()
+    plt.plot([c for c, _ in front.points], [e for _, e in front.points], marker="o")
+    plt.xlabel("Correctness")
+    plt.ylabel("Explainability")
+    plt.tight_layout()
+    plt.savefig(os.path.join(out_dir, f"lp_front_I{inp.max_nodes}_C{inp.c_max}.png"), dpi=300, bbox_inches="tight")
+    plt.close()
@@ -1,7 +1,53 @@
+import os
+import math
 import random
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import gurobipy as gp
 from pareto_points import Pareto_Points
+from inputs import Input
+from encoding import Encoding
+from lp_front import parametric_front, write_lp_front
+from parallel_boxes import default_threads
+from benchmark_table import write_benchmark
 import time
 
+# the variants of run_batch() and the attribute each stores its Pareto points on
+BUCKETS = {
+    "root_only": "pp_root_int",
+    "root_and_outgoing_nodes": "pp_root_and_outgoing_int",
+    "root_plus_random": "pp_root_plus_one_int",
+    "all_integers": "pp_all_int",
+    "all_continuous": "pp_all_continuous",
+}
+VARIANTS = tuple(BUCKETS)
+
+
+def _run_configuration(dir_name, max_nodes, root, inp, int_nodes, threads):
+    '''
+    runs the Pareto search of one integrality configuration in a worker process of run_batch() (own gp.Env),
+    returns (Pareto points, MILP calls, wall time)
+    '''
+    start = time.perf_counter()
+    with gp.Env() as env:
+        pp = Pareto_Points(dir_name, max_nodes, *int_nodes, root, threads=threads, env=env, inp=inp)
+        pp.cumulate_pareto_points()
+        pp.enc.model.dispose()
+    return list(pp.pareto_points), pp.milp_calls, time.perf_counter() - start
+
+
+def front_distance(front, reference):
+    '''
+    returns the largest |e_ref - e| over the points (c, e_ref) of the reference front, e the best explainability of
+    front at correctness c or more (inf if front has no such point), 0 if the fronts reach the same levels
+    '''
+    distance = 0.0
+    for c, e_ref in reference:
+        reached = [e for c_p, e in front if c_p >= c - 1e-9]
+        distance = max(distance, abs(e_ref - max(reached)) if reached else math.inf)
+    return distance
+
+
 class LP_Relaxation:
     '''
     This class groups six LP/ILP relaxation runs.
@@ -9,9 +55,11 @@ class LP_Relaxation:
       - pp_root_int
       - pp_root_and_outgoing_int # to be implemented
       - pp_leaf_transitions_int   # to be implemented
-      - pp_fix_root_and_then_relax # to be implemented
+      - pp_fix_root_and_then_relax
       - pp_root_plus_one_int
       - pp_all_int
+    run_batch() runs several of them at once in worker processes on one loaded Input and compares them,
+    run_sequence() runs them one after the other on one built model.
     '''
 
     def __init__(self, dir_name, max_nodes, root):
@@ -34,6 +82,13 @@ class LP_Relaxation:
         self.pp_all_lam_all_u_before_leaves_m_int = []
         self.pp_fix_root_and_then_relax = []
         self.pp_all_continuous = []
+        self.lp_front = None # LP_Front of all_continuous(parametric=True), with the basis of every breakpoint
+        self.inp = None # the Input, loaded once by _input() and shared by all the runs
+
+    def _input(self):
+        if self.inp is None:
+            self.inp = Input(self.dir_name, self.max_nodes)
+        return self.inp
 
     def _run(self, lam_nodes, tau_nodes=None, u_nodes=None, m_nodes=None, bucket_attr_name=None):
         '''
@@ -47,53 +102,121 @@ class LP_Relaxation:
         if m_nodes   is None: m_nodes   = set()
 
         pp = Pareto_Points(self.dir_name, self.max_nodes,
-                        lam_nodes, tau_nodes, u_nodes, m_nodes, self.root)
+                        lam_nodes, tau_nodes, u_nodes, m_nodes, self.root, inp=self._input())
         pp.cumulate_pareto_points()
         if bucket_attr_name is not None:
             setattr(self, bucket_attr_name, list(pp.pareto_points))
             return getattr(self, bucket_attr_name)
         return list(pp.pareto_points)
 
+    def configuration(self, variant, seed=None):
+        '''
+        returns the integral nodes (lam, tau, u, m) of a variant (one of VARIANTS)
+        '''
+        full = set(range(self.max_nodes))
+        if variant in ("root_only", "root_and_outgoing_nodes"):
+            # current simplified definition of root_and_outgoing_nodes = same ints as root_only (structure will decide children)
+            return {self.root}, {self.root}, set(), set()
+        if variant == "root_plus_random":
+            rng = random.Random(seed)
+            candidates = [i for i in range(self.max_nodes) if i != self.root]
+            chosen = self.root if not candidates else rng.choice(candidates)
+            print(f"The chosen random node is {chosen}")
+            return {self.root, chosen}, {self.root, chosen}, set(), set()
+        if variant == "all_integers":
+            return full, full, full, full
+        if variant == "all_continuous":
+            return set(), set(), set(), set()
+        raise ValueError(f"unknown variant {variant!r}, expected one of {VARIANTS}")
+
     def root_only(self):
-        lam = {self.root}
-        tau = {self.root}
-        u   = set()
-        m   = set()
-        return self._run(lam, tau, u, m, "pp_root_int")
+        return self._run(*self.configuration("root_only"), BUCKETS["root_only"])
 
     def root_and_outgoing_nodes(self):
-        # current simplified definition = same ints as root_only (structure will decide children)
-        lam = {self.root}
-        tau = {self.root}
-        u   = set()
-        m   = set()
-        return self._run(lam, tau, u, m, "pp_root_and_outgoing_int")
+        return self._run(*self.configuration("root_and_outgoing_nodes"), BUCKETS["root_and_outgoing_nodes"])
 
     def root_plus_random(self, seed=None):
-        rng = random.Random(seed)
-        candidates = [i for i in range(self.max_nodes) if i != self.root]
-        chosen = self.root if not candidates else rng.choice(candidates)
-        print(f"The chosen random node is {chosen}")
-        lam = {self.root, chosen}
-        tau = {self.root, chosen}
-        u   = set()
-        m   = set()
-        return self._run(lam, tau, u, m, "pp_root_plus_one_int")
+        return self._run(*self.configuration("root_plus_random", seed), BUCKETS["root_plus_random"])
 
     def all_integers(self):
+        return self._run(*self.configuration("all_integers"), BUCKETS["all_integers"])
+
+    def fix_root_and_then_relax(self):
+        '''
+        front of the all-integer lam and tau by relax and fix (see relax_and_fix.py): the diagram of every box is made
+        integral window by window from the root, each point with its gap to the relaxed bound of its box
+        '''
         full = set(range(self.max_nodes))
-        lam = full
-        tau = full
-        u   = full
-        m   = full
-        return self._run(lam, tau, u, m, "pp_all_int")
-
-    def all_continuous(self):
-        lam = set()
-        tau = set()
-        u   = set()
-        m   = set()
-        return self._run(lam, tau, u, m, "pp_all_continuous")
+        pp = Pareto_Points(self.dir_name, self.max_nodes, full, full, set(), set(), self.root, inp=self._input(), relax_and_fix=True)
+        pp.cumulate_pareto_points()
+        self.pp_fix_root_and_then_relax = list(pp.pareto_points)
+        return self.pp_fix_root_and_then_relax
+
+    def all_continuous(self, parametric=False):
+        '''
+        parametric - walks the front of the LP by one parametric LP (see lp_front.py) instead of solving its boxes
+        '''
+        if parametric:
+            enc = Encoding(set(), set(), set(), set(), self._input(), self.root, save_diagram=False)
+            self.lp_front = parametric_front(enc)
+            write_lp_front(self.lp_front, enc)
+            self.pp_all_continuous = [[c, e, None] for c, e in self.lp_front.points]
+            return self.pp_all_continuous
+        return self._run(*self.configuration("all_continuous"), BUCKETS["all_continuous"])
+
+    def run_sequence(self, variants=VARIANTS, seed=None):
+        '''
+        runs the variants one after the other on a single Encoding: it is built once and switched to the integral
+        nodes of every variant (see Encoding.set_integrality()), returns {variant: Pareto points}
+        '''
+        enc = None
+        fronts = {}
+        for variant in variants:
+            start = time.perf_counter()
+            pp = Pareto_Points(self.dir_name, self.max_nodes, *self.configuration(variant, seed), self.root, inp=self._input(), enc=enc)
+            enc = pp.enc
+            pp.cumulate_pareto_points()
+            setattr(self, BUCKETS[variant], list(pp.pareto_points))
+            fronts[variant] = getattr(self, BUCKETS[variant])
+            print(f"{variant}: {len(pp.pareto_points)} points, {pp.milp_calls} MILP calls, {time.perf_counter() - start:.2f} s")
+        return fronts
+
+    def run_batch(self, variants=VARIANTS, workers=None, threads=None, seed=None):
+        '''
+        runs the variants in parallel processes on the Input loaded once, every solve with threads gurobi threads
+        (default: the cores shared by the workers), the variants with the same integral nodes are run once.
+        all_integers is always run, it is the reference of the front distance (see front_distance()).
+        The table (wall time, MILP calls, points, front distance) is written to results/benchmarks/relaxations_I<max_nodes>.csv
+        '''
+        variants = list(variants) + ([] if "all_integers" in variants else ["all_integers"])
+        keys = {} # variant -> its integral nodes, as a hashable key
+        configurations = {} # key -> integral nodes
+        for variant in variants:
+            int_nodes = self.configuration(variant, seed)
+            keys[variant] = tuple(tuple(sorted(nodes)) for nodes in int_nodes)
+            configurations.setdefault(keys[variant], int_nodes)
+        workers = workers or min(len(configurations), os.cpu_count() or 1)
+        threads = threads or default_threads(workers)
+        inp = self._input()
+        # NOTE: the workers are started with "spawn", gurobi does not support forking a process that holds an Env
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = {key: executor.submit(_run_configuration, self.dir_name, self.max_nodes, self.root, inp, int_nodes, threads)
+                       for key, int_nodes in configurations.items()}
+            results = {key: future.result() for key, future in futures.items()}
+        reference = [(c, e) for c, e, _ in results[keys["all_integers"]][0]]
+        rows = []
+        for variant in variants:
+            points, milp_calls, wall_time = results[keys[variant]]
+            setattr(self, BUCKETS[variant], list(points))
+            rows.append({
+                "variant": variant,
+                "wall_time": round(wall_time, 3),
+                "milp_calls": milp_calls,
+                "points": len(points),
+                "front_distance": front_distance([(c, e) for c, e, _ in points], reference),
+            })
+        write_benchmark(self.dir_name, f"relaxations_I{self.max_nodes}.csv", rows)
+        return rows
 
 
 
@@ -0,0 +1,471 @@
+import numpy as np
+import scipy.sparse as sp
+import gurobipy as gp
+from gurobipy import GRB
+
+'''
+Vectorized construction of the constraints of Encoding (build_mode = "matrix").
+
+Every variable is addressed by its column in the model (Var.index), every arc (i,c,j) of tau by an integer arc id,
+and each constraint family of tree_constraints(), sample_constraints() and reachability_constraints() is emitted
+as one sparse block with Model.addMConstr instead of one addConstr per row.
+The rows are exactly the rows of the loop builder (same families, same counts), only their order in the model differs.
+
+Nodes are addressed by their position in list(enc.I) + list(enc.L) (the internal node enc.I[k] has position k,
+leaf L<k> has position |I| + k) and arcs are numbered in (i, c, j) order, so the arcs of a fixed (i, c) are the
+contiguous block arc_start[i, c] ... arc_start[i, c] + |J| - i - 2.
+In the presolved build (enc.presolve) some entries of the variable families are constants; they are moved to the
+right hand side, and rows that the [0,1] bounds of the variables already imply are dropped, exactly like
+Encoding._add_constr() does for the loop builder.
+'''
+
+TOLERANCE = 1e-9
+
+
+def is_redundant(max_activity, min_activity, sense, rhs):
+    '''
+    True where a row a x <sense> rhs holds for every x in [0,1]^n, max_activity / min_activity are the sums of the positive / negative entries of a
+    (works elementwise on arrays)
+    '''
+    if sense == GRB.LESS_EQUAL:
+        return max_activity <= rhs + TOLERANCE
+    if sense == GRB.GREATER_EQUAL:
+        return min_activity >= rhs - TOLERANCE
+    return (max_activity == 0) & (min_activity == 0) & (np.abs(rhs) <= TOLERANCE)
+
+
+def _expand(starts, lengths):
+    '''
+    returns (owner, element): for every k, owner repeats k lengths[k] times and element runs over starts[k], ..., starts[k] + lengths[k] - 1
+    '''
+    starts = np.asarray(starts, dtype=np.int64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    owner = np.repeat(np.arange(len(lengths)), lengths)
+    offsets = np.cumsum(lengths) - lengths
+    element = np.repeat(starts, lengths) + np.arange(lengths.sum()) - np.repeat(offsets, lengths)
+    return owner, element
+
+
+class Columns:
+    '''
+    Model columns of (an array of) entries of a variable family.
+    Instance attributes:
+        col(np.ndarray) - column index of every entry, -1 where the entry is a constant
+        const(np.ndarray) - value of the constant entries (0 where col >= 0)
+    '''
+    def __init__(self, col, const):
+        self.col = col
+        self.const = const
+
+    @classmethod
+    def of(cls, entries, shape):
+        '''
+        entries - iterable of gurobi variables and numbers (constants of the presolved build), in C order of shape
+        '''
+        entries = list(entries)
+        col = np.array([x.index if isinstance(x, gp.Var) else -1 for x in entries], dtype=np.int64).reshape(shape)
+        const = np.array([0.0 if isinstance(x, gp.Var) else float(x) for x in entries], dtype=np.float64).reshape(shape)
+        return cls(col, const)
+
+    def __getitem__(self, key):
+        return Columns(self.col[key], self.const[key])
+
+    def broadcast_to(self, shape):
+        return Columns(np.broadcast_to(self.col, shape), np.broadcast_to(self.const, shape))
+
+    def ravel(self):
+        return Columns(self.col.ravel(), self.const.ravel())
+
+
+class Constraint_Block:
+    '''
+    Accumulates the nonzeros of one constraint family (rows are numbered from 0) and adds it with a single addMConstr call.
+    Instance attributes:
+        num_rows(int) - number of rows of the family
+        shift(np.ndarray) - sum of the constant terms of every row (moved to the right hand side in emit())
+    '''
+    def __init__(self, num_rows):
+        self.num_rows = num_rows
+        self.rows = []
+        self.cols = []
+        self.vals = []
+        self.shift = np.zeros(num_rows)
+
+    def add(self, rows, columns, vals=1.0):
+        rows, cols, consts, vals = np.broadcast_arrays(np.asarray(rows, dtype=np.int64), columns.col, columns.const, np.asarray(vals, dtype=np.float64))
+        rows, cols, consts, vals = rows.ravel(), cols.ravel(), consts.ravel(), vals.ravel()
+        is_var = cols >= 0
+        self.rows.append(rows[is_var])
+        self.cols.append(cols[is_var])
+        self.vals.append(vals[is_var])
+        np.add.at(self.shift, rows[~is_var], vals[~is_var] * consts[~is_var])
+
+    def emit(self, model, sense, rhs, name="", presolve=False):
+        if self.num_rows == 0:
+            return None
+        rows = np.concatenate(self.rows) if self.rows else np.zeros(0, dtype=np.int64)
+        cols = np.concatenate(self.cols) if self.cols else np.zeros(0, dtype=np.int64)
+        vals = np.concatenate(self.vals) if self.vals else np.zeros(0)
+        A = sp.csr_matrix((vals, (rows, cols)), shape=(self.num_rows, model.NumVars))
+        rhs = np.broadcast_to(np.asarray(rhs, dtype=np.float64), (self.num_rows,)) - self.shift
+        if presolve:
+            A.sum_duplicates()
+            A.eliminate_zeros()
+            max_activity = np.asarray(A.maximum(0).sum(axis=1)).ravel()
+            min_activity = np.asarray(A.minimum(0).sum(axis=1)).ravel()
+            keep = ~is_redundant(max_activity, min_activity, sense, rhs)
+            if not keep.any():
+                return None
+            A, rhs = A[keep], rhs[keep]
+        return model.addMConstr(A, None, sense, rhs, name=name)
+
+
+class Matrix_Builder:
+    '''
+    Instance attributes:
+        enc(Encoding) - the encoding whose (already created) variables are constrained
+        nI, nL, nJ - number of internal nodes, leaves and of all nodes
+        root(int) - position of enc.root
+        lam_col(Columns) - (|I|, |P|) columns of lam, o_u_col likewise
+        u_col(Columns) - (|I|,) columns of u
+        m_col(Columns) - (|J|, |S|) columns of m (node position, sample class)
+        b_col(Columns) - (|I|, |C|, |S|) columns of b
+        arc_i, arc_c, arc_j(np.ndarray) - (|A|,) parent, bucket and child position of every arc
+        arc_start(np.ndarray) - (|I|, |C|) first arc id of every (i, c)
+        tau_col, z_u_col(Columns) - (|A|,) columns of tau and z_u
+        d_col(Columns) - (|A|, |S|) columns of d (None for the compact and the flow formulation)
+        f_col(Columns) - (|A|, |S|) columns of f (only for the flow formulation, the entries without a variable are constants 0)
+    '''
+    def __init__(self, enc):
+        self.enc = enc
+        enc.model.update()
+        self.nI = len(enc.I)
+        self.nL = len(enc.L)
+        self.nJ = self.nI + self.nL
+        self.nC = len(enc.C)
+        self.nP = len(enc.P)
+        self.nS = len(enc.S)
+        nodes = list(enc.I) + list(enc.L.keys())
+        self.root = nodes.index(enc.root)
+        self.lam_col = Columns.of((enc.lam[i, p] for i in enc.I for p in enc.P), (self.nI, self.nP))
+        self.o_u_col = Columns.of((enc.o_u[i, p] for i in enc.I for p in enc.P), (self.nI, self.nP))
+        self.u_col = Columns.of((enc.u[i] for i in enc.I), (self.nI,))
+        # the flow formulation only has m for the root, the other entries are never used
+        self.m_col = Columns.of((enc.m.get((j, s), 0.0) for j in nodes for s in enc.S), (self.nJ, self.nS))
+        self.b_col = None if enc.formulation != "standard" else Columns.of((enc.b[i, c, s] for i in enc.I for c in enc.C for s in enc.S), (self.nI, self.nC, self.nS))
+        arcs = [(i, c, jpos) for i in range(self.nI) for c in enc.C for jpos in range(i + 1, self.nJ)]
+        arcs = np.array(arcs, dtype=np.int64).reshape(-1, 3)
+        self.arc_i, self.arc_c, self.arc_j = arcs[:, 0], arcs[:, 1], arcs[:, 2]
+        self.arc_len = self.nJ - 1 - np.arange(self.nI) # number of children of every i for a fixed c
+        self.arc_start = np.zeros((self.nI, self.nC), dtype=np.int64)
+        self.arc_start.ravel()[:] = np.cumsum(np.repeat(self.arc_len, self.nC)) - np.repeat(self.arc_len, self.nC)
+        self.tau_col = Columns.of((enc.tau[nodes[i], c, nodes[j]] for i, c, j in arcs), (len(arcs),))
+        # z_u only exists for internal children in the presolved build, the other entries are never used
+        self.z_u_col = Columns.of((enc.z_u.get((nodes[i], c, nodes[j]), 0.0) for i, c, j in arcs), (len(arcs),))
+        standard = enc.formulation == "standard"
+        self.d_col = Columns.of((enc.d[nodes[i], c, nodes[j], s] for i, c, j in arcs for s in enc.S), (len(arcs), self.nS)) if standard else None
+        self.f_col = Columns.of((enc.f.get((nodes[i], c, nodes[j], s), 0.0) for i, c, j in arcs for s in enc.S), (len(arcs), self.nS)) if enc.formulation == "flow" else None
+        self.num_buckets = np.array([enc.B_P(p) for p in enc.P], dtype=np.int64)
+
+    def _emit(self, block, sense, rhs, name=""):
+        return block.emit(self.enc.model, sense, rhs, name=name, presolve=self.enc.presolve)
+
+    def build(self):
+        self.tree_constraints()
+        self.sample_constraints()
+        self.reachability_constraints()
+        if self.enc.symmetry_breaking:
+            self.symmetry_breaking_constraints()
+
+    def _ic_pairs(self, valid):
+        '''
+        returns (i, p, c) arrays of every triple with valid[p, c] True, in loop order
+        '''
+        p, c = np.nonzero(valid)
+        i = np.repeat(np.arange(self.nI), len(p))
+        return i, np.tile(p, self.nI), np.tile(c, self.nI)
+
+    def tree_constraints(self):
+        # every internal node is assigned exactly one predicate
+        block = Constraint_Block(self.nI)
+        block.add(np.arange(self.nI)[:, None], self.lam_col)
+        self._emit(block, GRB.EQUAL, 1.0)
+
+        c_range = np.arange(self.nC)
+        valid = c_range[None, :] < self.num_buckets[:, None] # valid[p, c] = valid_branch(c, p)
+        t_i, t_p, t_c = self._ic_pairs(valid)
+        n = len(t_i)
+        owner, arc = _expand(self.arc_start[t_i, t_c], self.arc_len[t_i]) # the arcs of (t_i, t_c) of every triple
+        # unique transitions (the "<= 2" and consistency rows are implied by the equality below, see Encoding.tree_constraints)
+        block = Constraint_Block(n)
+        block.add(np.arange(n), self.lam_col[t_i, t_p])
+        block.add(owner, self.tau_col[arc], -1.0)
+        self._emit(block, GRB.LESS_EQUAL, 0.0)
+        # parent and child do not share the predicate
+        owner, j = _expand(t_i + 1, self.nI - 1 - t_i)
+        block = Constraint_Block(len(owner))
+        rows = np.arange(len(owner))
+        block.add(rows, self.lam_col[t_i[owner], t_p[owner]])
+        block.add(rows, self.tau_col[self.arc_start[t_i[owner], t_c[owner]] + (j - t_i[owner] - 1)])
+        block.add(rows, self.lam_col[j, t_p[owner]])
+        self._emit(block, GRB.LESS_EQUAL, 2.0)
+
+        # sum_j tau[i,c,j] == sum_p valid_branch(c,p) * lam[i,p]
+        block = Constraint_Block(self.nI * self.nC)
+        block.add(self.arc_i * self.nC + self.arc_c, self.tau_col)
+        p, c = np.nonzero(valid)
+        rows = np.arange(self.nI)[:, None] * self.nC + c[None, :]
+        block.add(rows, self.lam_col[:, p], -1.0)
+        self._emit(block, GRB.EQUAL, 0.0)
+
+    def sample_constraints(self):
+        enc = self.enc
+        nS = self.nS
+        membership = enc.inp.class_membership
+        label_idx = enc.inp.class_label_idx
+        s_range = np.arange(nS)
+        if enc.formulation == "flow":
+            self.flow_sample_constraints()
+            return
+
+        # labelling the leaves
+        block = Constraint_Block(self.nL * nS)
+        block.add(np.arange(self.nL * nS), self.m_col[self.nI:, :].ravel())
+        self._emit(block, GRB.EQUAL, (label_idx[None, :] == np.arange(self.nL)[:, None]).astype(np.float64).ravel(), name="leaf")
+        if enc.formulation == "compact":
+            self.compact_sample_constraints()
+            return
+
+        # b[i,c,s] == sum_p func(s,p,c) * lam[i,p], row (i, c, s)
+        block = Constraint_Block(self.nI * self.nC * nS)
+        block.add(np.arange(self.nI * self.nC * nS), self.b_col.ravel())
+        s, p, c = np.nonzero(membership)
+        rows = (np.arange(self.nI)[:, None] * self.nC + c[None, :]) * nS + s[None, :]
+        block.add(rows, self.lam_col[:, p], -1.0)
+        self._emit(block, GRB.EQUAL, 0.0, name="forming_b")
+
+        # one row per (arc, s)
+        num_arcs = len(self.arc_i)
+        rows = np.arange(num_arcs * nS).reshape(num_arcs, nS)
+        b = self.b_col[self.arc_i[:, None], self.arc_c[:, None], s_range[None, :]]
+        m_child = self.m_col[self.arc_j[:, None], s_range[None, :]]
+        m_parent = self.m_col[self.arc_i[:, None], s_range[None, :]]
+        tau = self.tau_col[:, None]
+        # m lower bound: b + m_j + tau - m_i <= 2
+        block = Constraint_Block(num_arcs * nS)
+        block.add(rows, b)
+        block.add(rows, m_child)
+        block.add(rows, tau)
+        block.add(rows, m_parent, -1.0)
+        self._emit(block, GRB.LESS_EQUAL, 2.0, name="m_lower_bound")
+        # d triangle bounds
+        block = Constraint_Block(num_arcs * nS)
+        block.add(rows, self.d_col)
+        block.add(rows, b, -1.0)
+        block.add(rows, m_child, -1.0)
+        block.add(rows, tau, -1.0)
+        self._emit(block, GRB.GREATER_EQUAL, -2.0, name="d_upper_bound")
+        for other in (b, m_child, tau):
+            block = Constraint_Block(num_arcs * nS)
+            block.add(rows, self.d_col)
+            block.add(rows, other, -1.0)
+            self._emit(block, GRB.LESS_EQUAL, 0.0)
+
+        # flow consistency: sum_j d[i,c,j,s] <= b[i,c,s], row (i, c, s)
+        block = Constraint_Block(self.nI * self.nC * nS)
+        block.add(((self.arc_i * self.nC + self.arc_c)[:, None]) * nS + s_range[None, :], self.d_col)
+        block.add(np.arange(self.nI * self.nC * nS), self.b_col.ravel(), -1.0)
+        self._emit(block, GRB.LESS_EQUAL, 0.0)
+
+        # m upper bound: m[i,s] <= sum_{c,j} d[i,c,j,s], row (i, s)
+        block = Constraint_Block(self.nI * nS)
+        block.add(np.arange(self.nI * nS), self.m_col[:self.nI, :].ravel())
+        block.add(self.arc_i[:, None] * nS + s_range[None, :], self.d_col, -1.0)
+        self._emit(block, GRB.LESS_EQUAL, 0.0, name="m_upper_bound")
+
+    def _add_bucket_sums(self, block, coeff):
+        '''
+        adds coeff * sum_p func(s,p,c) * lam[i,p] (the expression b[i,c,s] stands for) to row (a, s) for every arc a = (i,c,j) and class s
+        '''
+        nS = self.nS
+        s, p, c = np.nonzero(self.enc.inp.class_membership)
+        for bucket in range(self.nC):
+            arcs = np.nonzero(self.arc_c == bucket)[0]
+            in_bucket = c == bucket
+            rows = arcs[:, None] * nS + s[in_bucket][None, :]
+            block.add(rows, self.lam_col[self.arc_i[arcs][:, None], p[in_bucket][None, :]], coeff)
+
+    def compact_sample_constraints(self):
+        '''
+        see Encoding.compact_sample_constraints()
+        '''
+        nS = self.nS
+        membership = self.enc.inp.class_membership
+        s_range = np.arange(nS)
+        num_arcs = len(self.arc_i)
+        rows = np.arange(num_arcs * nS).reshape(num_arcs, nS)
+        m_child = self.m_col[self.arc_j[:, None], s_range[None, :]]
+        m_parent = self.m_col[self.arc_i[:, None], s_range[None, :]]
+        tau = self.tau_col[:, None]
+        # m lower bound: b + m_j + tau - m_i <= 2
+        block = Constraint_Block(num_arcs * nS)
+        self._add_bucket_sums(block, 1.0)
+        block.add(rows, m_child)
+        block.add(rows, tau)
+        block.add(rows, m_parent, -1.0)
+        self._emit(block, GRB.LESS_EQUAL, 2.0, name="m_lower_bound")
+        # m upper bound: m_i - m_j + tau + b <= 2
+        block = Constraint_Block(num_arcs * nS)
+        block.add(rows, m_parent)
+        block.add(rows, m_child, -1.0)
+        block.add(rows, tau)
+        self._add_bucket_sums(block, 1.0)
+        self._emit(block, GRB.LESS_EQUAL, 2.0, name="m_upper_bound")
+        # m[i,s] <= sum_c b[i,c,s] for the classes that miss a bucket of some predicate, row (i, uncovered s)
+        uncovered = np.nonzero(~membership.any(axis=2).all(axis=1))[0]
+        nU = len(uncovered)
+        block = Constraint_Block(self.nI * nU)
+        block.add(np.arange(self.nI * nU), self.m_col[:self.nI, uncovered].ravel())
+        k, p, c = np.nonzero(membership[uncovered])
+        block.add(np.arange(self.nI)[:, None] * nU + k[None, :], self.lam_col[:, p], -1.0)
+        self._emit(block, GRB.LESS_EQUAL, 0.0)
+
+    def flow_sample_constraints(self):
+        '''
+        see Encoding.flow_sample_constraints()
+        '''
+        nS = self.nS
+        s_range = np.arange(nS)
+        exists = self.f_col.col >= 0 # (|A|, |S|)
+        arc_of, s_of = np.nonzero(exists)
+        f = self.f_col[arc_of, s_of]
+        # the flow out of the root is the correctness of class s
+        block = Constraint_Block(nS)
+        from_root = self.arc_i[arc_of] == self.root
+        block.add(s_of[from_root], f[from_root])
+        block.add(s_range, self.m_col[self.root], -1.0)
+        self._emit(block, GRB.EQUAL, 0.0, name="root_flow")
+        # flow conservation, row (i, s) for every internal i except the root
+        others = np.array([i for i in range(self.nI) if i != self.root], dtype=np.int64)
+        row_of = np.full(self.nI, -1, dtype=np.int64)
+        row_of[others] = np.arange(len(others))
+        block = Constraint_Block(len(others) * nS)
+        into = (self.arc_j[arc_of] < self.nI) & (self.arc_j[arc_of] != self.root)
+        block.add(row_of[self.arc_j[arc_of[into]]] * nS + s_of[into], f[into])
+        out_of = self.arc_i[arc_of] != self.root
+        block.add(row_of[self.arc_i[arc_of[out_of]]] * nS + s_of[out_of], f[out_of], -1.0)
+        self._emit(block, GRB.EQUAL, 0.0, name="flow_conservation")
+        # bucket capacity, one row per (i, c, s) with at least one flow variable
+        ics = (self.arc_i[arc_of] * self.nC + self.arc_c[arc_of]) * nS + s_of
+        used, row = np.unique(ics, return_inverse=True)
+        block = Constraint_Block(len(used))
+        block.add(row, f)
+        used_i, rest = np.divmod(used, self.nC * nS)
+        used_c, used_s = np.divmod(rest, nS)
+        k, p, c = np.nonzero(self.enc.inp.class_membership[used_s]) # k runs over the rows
+        in_bucket = c == used_c[k]
+        block.add(k[in_bucket], self.lam_col[used_i[k[in_bucket]], p[in_bucket]], -1.0)
+        self._emit(block, GRB.LESS_EQUAL, 0.0, name="bucket_capacity")
+        # arc capacity f <= tau, one row per flow variable
+        block = Constraint_Block(len(arc_of))
+        rows = np.arange(len(arc_of))
+        block.add(rows, f)
+        block.add(rows, self.tau_col[arc_of], -1.0)
+        self._emit(block, GRB.LESS_EQUAL, 0.0, name="arc_capacity")
+
+    def symmetry_breaking_constraints(self):
+        '''
+        see Encoding.symmetry_breaking_constraints()
+        '''
+        # u[i] >= u[i+1] for root <= i < |I| - 1
+        prefix = np.arange(self.root, self.nI - 1)
+        block = Constraint_Block(len(prefix))
+        rows = np.arange(len(prefix))
+        block.add(rows, self.u_col[prefix])
+        block.add(rows, self.u_col[prefix + 1], -1.0)
+        self._emit(block, GRB.GREATER_EQUAL, 0.0, name="active_prefix")
+        # lam[i,0] + u[i] >= 1 for every i except the root
+        others = np.array([i for i in range(self.nI) if i != self.root], dtype=np.int64)
+        rows = np.arange(len(others))
+        block = Constraint_Block(len(others))
+        block.add(rows, self.lam_col[others, 0])
+        block.add(rows, self.u_col[others])
+        self._emit(block, GRB.GREATER_EQUAL, 1.0, name="inactive_predicate")
+        # tau[i,c,L0] + u[i] >= 1 for every i except the root and c < num_buckets of the first predicate
+        num_buckets = int(self.num_buckets[0])
+        i = np.repeat(others, num_buckets)
+        c = np.tile(np.arange(num_buckets), len(others))
+        arcs = self.arc_start[i, c] + (self.nI - i - 1) # L0 has position |I|
+        rows = np.arange(len(i))
+        block = Constraint_Block(len(i))
+        block.add(rows, self.tau_col[arcs])
+        block.add(rows, self.u_col[i])
+        self._emit(block, GRB.GREATER_EQUAL, 1.0, name="inactive_transition")
+
+    def reachability_constraints(self):
+        enc = self.enc
+        root = self.root
+        # root active
+        block = Constraint_Block(1)
+        block.add(0, self.u_col[root])
+        self._emit(block, GRB.EQUAL, 1.0, name="root_active")
+        # all nodes with index less than root inactive
+        block = Constraint_Block(root)
+        block.add(np.arange(root), self.u_col[:root])
+        self._emit(block, GRB.EQUAL, 0.0, name="nodes_less_than_root_inactive")
+
+        # top-down reachability, one row per arc into an internal node
+        internal = np.nonzero(self.arc_j < self.nI)[0]
+        rows = np.arange(len(internal))
+        u_child = self.u_col[self.arc_j[internal]]
+        u_parent = self.u_col[self.arc_i[internal]]
+        tau = self.tau_col[internal]
+        z_u = self.z_u_col[internal]
+        block = Constraint_Block(len(internal))
+        block.add(rows, u_child)
+        block.add(rows, tau, -1.0)
+        block.add(rows, u_parent, -1.0)
+        self._emit(block, GRB.GREATER_EQUAL, -1.0)
+        block = Constraint_Block(len(internal))
+        block.add(rows, z_u)
+        block.add(rows, u_parent, -1.0)
+        block.add(rows, tau, -1.0)
+        self._emit(block, GRB.GREATER_EQUAL, -1.0)
+        for other in (u_parent, tau):
+            block = Constraint_Block(len(internal))
+            block.add(rows, z_u)
+            block.add(rows, other, -1.0)
+            self._emit(block, GRB.LESS_EQUAL, 0.0)
+        # u[j] <= sum_{i,c} z_u[i,c,j] for every internal j except the root
+        others = np.array([j for j in range(self.nI) if j != root], dtype=np.int64)
+        row_of = np.full(self.nI, -1, dtype=np.int64)
+        row_of[others] = np.arange(len(others))
+        block = Constraint_Block(len(others))
+        block.add(np.arange(len(others)), self.u_col[others])
+        into_others = internal[self.arc_j[internal] != root]
+        block.add(row_of[self.arc_j[into_others]], self.z_u_col[into_others], -1.0)
+        self._emit(block, GRB.LESS_EQUAL, 0.0)
+
+        # o_u linking: only one active predicate per active node
+        rows = np.arange(self.nI * self.nP).reshape(self.nI, self.nP)
+        u = self.u_col[:, None].broadcast_to(rows.shape)
+        block = Constraint_Block(self.nI * self.nP)
+        block.add(rows, self.o_u_col)
+        block.add(rows, u, -1.0)
+        block.add(rows, self.lam_col, -1.0)
+        self._emit(block, GRB.GREATER_EQUAL, -1.0)
+        for other in (u, self.lam_col):
+            block = Constraint_Block(self.nI * self.nP)
+            block.add(rows, self.o_u_col)
+            block.add(rows, other, -1.0)
+            self._emit(block, GRB.LESS_EQUAL, 0.0)
+        block = Constraint_Block(self.nI)
+        block.add(np.arange(self.nI)[:, None], self.o_u_col)
+        self._emit(block, GRB.LESS_EQUAL, 1.0)
+
+        # explanation budget: (max_weight+1) * sum_i (1 - u[i]) + sum w_p o_u[i,p] <= MAX_EXPLANATION
+        weights = np.array([enc.inp.predicates[p].weight for p in enc.P], dtype=np.float64)
+        block = Constraint_Block(1)
+        block.add(0, self.u_col, -(enc.inp.max_weight + 1))
+        block.add(0, self.o_u_col, np.broadcast_to(weights[None, :], (self.nI, self.nP)))
+        self._emit(block, GRB.LESS_EQUAL, enc.MAX_EXPLANATION - (enc.inp.max_weight + 1) * (self.nI + enc.num_pruned_nodes))
@@ -0,0 +1,118 @@
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import gurobipy as gp
+
+'''
+Solves the boxes of the Pareto search in a pool of worker processes.
+
+The two boxes split off a Pareto point are disjoint, so they can be solved at the same time.
+The boxes wait in pp.queue (see box_queue.py) and the first ones in its order are sent to the idle workers.
+Every worker builds its own Pareto_Points (own gp.Env, own Encoding, own warm start) once and then solves the
+boxes it is sent. The main process keeps the queue, the pool candidates and the Pareto points:
+a worker returns what Pareto_Points.solve_box() returns and the main process records the point and queues the
+children of the box, so the result is merged by clean_pareto_points() exactly as in the sequential search.
+NOTE: the workers are started with "spawn", gurobi does not support forking a process that holds an Env
+'''
+
+_worker = None # the Pareto_Points of this worker process
+
+
+def _init_worker(cls, args, kwargs, threads):
+    global _worker
+    env = gp.Env()
+    _worker = cls(*args, **kwargs, threads=threads, env=env)
+
+
+def _solve_box(box, time_limit):
+    '''
+    returns (result of solve_box(), {"milp_calls", "solve_time", "node_count", "overhead_time", "infeasible_calls", "open_boxes", "status"} of this solve)
+    time_limit - seconds left of the time budget (None = no budget)
+    '''
+    _worker.deadline = None if time_limit is None else time.perf_counter() + time_limit
+    open_before = len(_worker.open_boxes)
+    names = ("milp_calls", "solve_time", "node_count", "overhead_time", "infeasible_calls")
+    before = [getattr(_worker, name) for name in names]
+    result = _worker.solve_box(*box)
+    stats = {name: getattr(_worker, name) - b for name, b in zip(names, before)}
+    stats["open_boxes"] = _worker.open_boxes[open_before:]
+    stats["status"] = _worker.last_status
+    return result, stats
+
+
+def default_threads(workers):
+    '''
+    gurobi threads per solve such that workers * threads fits the machine
+    '''
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def find_pareto_points_parallel(pp, workers=None, threads=None):
+    '''
+    same search as pp.find_pareto_points(None, None, None, None) with pp.workers (or workers) processes,
+    each solve uses pp.threads (or threads, or default_threads()) gurobi threads
+    '''
+    workers = workers or pp.workers
+    threads = threads or pp.threads or default_threads(workers)
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_init_worker, initargs=(type(pp), pp.worker_args, pp.worker_kwargs, threads))
+    queue = pp.queue
+    pending = {} # future -> the box (e_l, e_u, c_l, c_u, pool_bound) it solves
+
+    with executor:
+        queue.push((None, None, None, None, None))
+        while queue or pending:
+            # keep every worker busy with the boxes first in the queue
+            if pp.deadline is not None and time.perf_counter() >= pp.deadline:
+                # the boxes not searched in time stay open
+                pp.open_boxes += [(*b[:4], *pp.box_bounds.get(b[:4], (None, pp.enc.objective_weights))) for b in queue.pending()]
+                queue.clear()
+            while queue and len(pending) < workers:
+                if pp.queue_hook is not None:
+                    pp.queue_hook(queue)
+                e_l, e_u, c_l, c_u, pool_bound = box = queue.pop()
+                if (e_l is not None and e_u is not None and e_l > e_u) or (c_l is not None and c_u is not None and c_l > c_u):
+                    continue
+                print(f"Dispatching e_l={e_l}, e_u={e_u}, c_l={c_l}, c_u={c_u}")
+                # the pool candidates, points and empty boxes of all the boxes solved so far are in pp
+                box = pp.prune_box(box)
+                if box is None:
+                    continue
+                children = pp.close_box(*box)
+                entry = None if children is not None or pp.checkpoint is None else pp.checkpoint.lookup(box[:4], pp.enc.objective_weights)
+                if entry is not None:
+                    result = pp.replay_solve(entry)
+                    retry = pp.split_timed_out(box, result) if pp.last_status in ("time_limit", "unproven") else []
+                    # the children were queued when the solve was recorded
+                    queue.extend(retry if result is None else pp.add_point(*box, result) + retry)
+                elif children is None:
+                    time_limit = None if pp.deadline is None else pp.deadline - time.perf_counter()
+                    pending[executor.submit(_solve_box, box[:4], time_limit)] = box
+                else:
+                    queue.extend(children)
+            if not pending:
+                continue
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                box = pending.pop(future)
+                result, stats = future.result()
+                pp.milp_calls += stats["milp_calls"]
+                pp.solve_time += stats["solve_time"]
+                pp.node_count += stats["node_count"]
+                pp.overhead_time += stats["overhead_time"]
+                pp.infeasible_calls += stats["infeasible_calls"]
+                pp.open_boxes += stats["open_boxes"]
+                if pp.checkpoint is not None and stats["milp_calls"]:
+                    open_box = stats["open_boxes"][0] if stats["open_boxes"] else None
+                    pp.checkpoint.record_solve(box[:4], pp.enc.objective_weights, result, stats["infeasible_calls"] > 0, open_box, stats["status"])
+                retry = pp.split_timed_out(box, result) if stats["status"] in ("time_limit", "unproven") else []
+                if result is None:
+                    if stats["infeasible_calls"]:
+                        pp.memo.add(box)
+                    queue.extend(retry)
+                    continue
+                children = pp.add_point(*box, result) + retry
+                queue.extend(children)
+                if pp.checkpoint is not None:
+                    pp.checkpoint.record_queued(children)
@@ -9,60 +9,422 @@ import time
 
 from inputs import Input, Predicate
 from encoding import Encoding
+from warm_start import Warm_Start
+from enumerators import enumerate_front
+from anytime import write_anytime_report, open_box_cap
+from checkpoint import Checkpoint
+from box_queue import Box_Queue
+from archive import Pareto_Archive, Infeasible_Memo, tighten_box, is_empty
+from bound_envelope import relaxed_envelope, write_envelope_report
+from relax_and_fix import Relax_And_Fix
 
 
 class Pareto_Points:
-    def __init__(self,dir_name, max_nodes, lam_int_nodes , tau_int_nodes , u_int_nodes, m_int_nodes, root:int):
+    def __init__(self,dir_name, max_nodes, lam_int_nodes , tau_int_nodes , u_int_nodes, m_int_nodes, root:int, build_mode = "loop", presolve = False, formulation = "standard", symmetry_breaking = False, warm_start = False, pool_solutions = None, pool_search_mode = None, workers = 1, threads = None, env = None, queue_policy = "depth_first", queue_hook = None, checkpoint = False, box_time_limit = None, box_mip_gap = None, max_split_depth = 2, relaxed_bound = None, relaxed_levels = None, inp = None, enc = None, relax_and_fix = False):
         self.root = root
-        self.inp = Input(dir_name, max_nodes)
+        # inp - an Input of dir_name already loaded (shared by several runs), else it is loaded here
+        self.inp = Input(dir_name, max_nodes) if inp is None else inp
         self.pareto_points= []
-        self.enc = Encoding(lam_int_nodes, tau_int_nodes , u_int_nodes , m_int_nodes, self.inp, root)
-
-    def find_pareto_points(self, e_l, e_u , c_l , c_u):
-        if (e_l is not None and e_u is not None and e_l > e_u) or (c_l is not None and c_u is not None and c_l > c_u):
-            return
-        print("-----------------------------------------------------------------")
-        print(f"e_l={e_l}, e_u={e_u}, c_l={c_l}, c_u={c_u}")
-        print("Inside the find_pareto_points function")
+        if enc is None:
+            self.enc = Encoding(lam_int_nodes, tau_int_nodes , u_int_nodes , m_int_nodes, self.inp, root, build_mode=build_mode, presolve=presolve, formulation=formulation, symmetry_breaking=symmetry_breaking, env=env)
+        else:
+            # a built Encoding of the same Input and options is reused with these integral nodes (see Encoding.set_integrality())
+            self.enc = enc
+            self.enc.set_integrality(lam_int_nodes, tau_int_nodes, u_int_nodes, m_int_nodes)
+        # everything needed to build the same Pareto_Points in a worker process (see parallel_boxes.py)
+        self.worker_args = (dir_name, max_nodes, lam_int_nodes, tau_int_nodes, u_int_nodes, m_int_nodes, root)
+        self.worker_kwargs = dict(build_mode=build_mode, presolve=presolve, formulation=formulation, symmetry_breaking=symmetry_breaking,
+                                  warm_start=warm_start, pool_solutions=pool_solutions, pool_search_mode=pool_search_mode,
+                                  box_time_limit=box_time_limit, box_mip_gap=box_mip_gap, relax_and_fix=relax_and_fix)
+        self.workers = workers # > 1: the boxes are solved by a pool of worker processes
+        self.threads = threads # gurobi threads per solve (None = gurobi's default, see parallel_boxes.py for the workers)
+        if threads is not None:
+            self.enc.model.Params.Threads = threads
+        # the pending boxes (see box_queue.py), queue_hook(queue) is called before every box is taken from the queue
+        self.queue = Box_Queue(queue_policy, self.enc.N_SAMPLES)
+        self.queue_hook = queue_hook
+        # the points found so far and the boxes proven empty, a box is shrunk to what neither covers before it is solved (see archive.py)
+        self.archive = Pareto_Archive()
+        self.memo = Infeasible_Memo()
+        self.skipped_boxes = 0 # boxes left empty by prune_box()
+        # upper bound curve from the relaxation with the integral nodes relaxed_bound = (lam, tau, u, m), computed before
+        # the search by cumulate_pareto_points(), the boxes are cut with it too (see bound_envelope.py)
+        if relaxed_bound is not None:
+            # the bound holds only if every exact solution is a solution of the relaxation
+            for name, relaxed, exact in zip(("lam", "tau", "u", "m"), relaxed_bound, (lam_int_nodes, tau_int_nodes, u_int_nodes, m_int_nodes)):
+                if not set(relaxed) <= set(exact):
+                    raise ValueError(f"the {name} integral nodes of relaxed_bound must be integral nodes of the search, {sorted(set(relaxed) - set(exact))} are not")
+            if relaxed_levels is not None and relaxed_levels < 2:
+                raise ValueError(f"relaxed_levels must be at least 2 (c = 0 and c = 1), got {relaxed_levels}")
+        self.relaxed_bound = relaxed_bound
+        self.relaxed_levels = relaxed_levels
+        self.envelope = None
+        self.env = env
+        self.encoding_options = dict(build_mode=build_mode, presolve=presolve, formulation=formulation, symmetry_breaking=symmetry_breaking)
+        self.tightened_boxes = 0 # boxes shrunk by prune_box()
+        # anytime search (see anytime.py): no solve starts after the deadline (time.perf_counter() value, None = no budget)
+        self.deadline = None
+        self.open_boxes = [] # (e_l, e_u, c_l, c_u, obj_bound, weights) parts of the plane that may still hold better points
+        self.point_gaps = {} # (c, e) rounded -> MIP gap of the solve that found the point (0.0 if proven optimal)
+        self.box_bounds = {} # (e_l, e_u, c_l, c_u) of a queued box -> (obj_bound, weights) of the box it was split from
+        # per box limits: a box stopped by box_time_limit is searched again in smaller boxes up to max_split_depth times, then flagged
+        self.box_time_limit = box_time_limit
+        self.max_split_depth = max_split_depth
+        if box_mip_gap is not None:
+            self.enc.model.Params.MIPGap = box_mip_gap
+        self.last_status = None # "optimal", "infeasible", "time_limit" (stopped by a limit), "unproven" (relax and fix point
+                                # below the bound of its box) or "budget" (not started) of the last solve_box()
+        self.box_depth = {} # (e_l, e_u, c_l, c_u) -> how many times the box was split off a timed-out box
+        self.flagged_boxes = [] # (e_l, e_u, c_l, c_u) of the timed-out boxes not split any further
+        self.point_bounds = {} # (c, e) rounded -> (e_bound, proven): no point of its box with correctness c has e above e_bound
+        # append-only log of the solves, a rerun with the same dataset and configuration resumes by replaying it (see checkpoint.py)
+        self.checkpoint = Checkpoint(self) if checkpoint else None
+        # statistics of the search
+        self.milp_calls = 0 # number of Encoding.solve() calls
+        self.infeasible_calls = 0 # the calls that ended infeasible
+        self.solve_time = 0.0 # sum of the gurobi run times (seconds)
+        self.node_count = 0 # sum of the explored branch and bound nodes
+        self.overhead_time = 0.0 # sum of the time spent in Encoding.solve() before optimize() (setting up the box)
+        # MIP starts from the solutions of the previous boxes (see warm_start.py)
+        self.warm_start = Warm_Start(self.enc) if warm_start else None
+        # a reused Encoding may still hold the callback of the previous run
+        self.enc.optimize_callback = None if self.warm_start is None else self.warm_start.callback
+        # solution pool: every solution gurobi keeps is a feasible (c, e), they are collected in self.candidates and
+        # a box whose objective bound is reached by a candidate inside it is closed without a MILP call
+        self.use_pool = pool_solutions is not None or pool_search_mode is not None
+        if pool_solutions is not None:
+            self.enc.model.Params.PoolSolutions = pool_solutions
+        if pool_search_mode is not None:
+            self.enc.model.Params.PoolSearchMode = pool_search_mode
+        self.candidates = set() # (c, e) of every pool solution seen
+        # relax and fix: a box is solved window by window from the root, its point is integral but only bounded by a relaxation (see relax_and_fix.py)
+        self.relax_and_fix = Relax_And_Fix(self.enc) if relax_and_fix else None
+        self.saved_calls = 0 # boxes closed by a candidate
+
+    def round_point(self, c, e):
+        c_final = max(0.0, min(1.0, round(c / self.enc.C_QUANT) * self.enc.C_QUANT))
+        assert abs(c_final-c)<= 0.5 * self.enc.C_QUANT + 1e-12, f"Moving away because of the rounding too much!, by {abs(c_final-c)}"
+        return c_final, round(e,self.enc.E_ROUNDING_LIMIT)
+
+    def harvest_pool(self, points):
+        for c, e in points:
+            # kept unrounded (only up to solver noise): rounding c could lift e + N*c above the bound of a box
+            self.candidates.add((round(c, 9), round(e, 6)))
+
+    def closing_candidate(self, e_l, e_u, c_l, c_u, pool_bound):
+        '''
+        returns the best candidate (c, e) inside the box (largest e + N*c) if it is optimal for the box, else None.
+        It is optimal if e + N*c reaches pool_bound: every solution of the box above pool_bound was in the pool of an
+        enclosing box (gurobi's PoolObjBound), so a better solution would be a candidate too.
+        The corner e_u + N*c_u bounds the objective of the box as well.
+        NOTE: dominated candidates are kept too, the optimum of a box can be dominated by a point outside of it
+        '''
+        N = self.enc.N_SAMPLES
+        eps = 1e-6
+        inside = [(c, e) for c, e in self.candidates
+                  if (e_l is None or e >= e_l - eps) and (e_u is None or e <= e_u + eps) and
+                     (c_l is None or c >= c_l - eps) and (c_u is None or c <= c_u + eps)]
+        if not inside:
+            return None
+        c, e = max(inside, key=lambda point: point[1] + N*point[0])
+        bounds = [b for b in (pool_bound, e_u + N*c_u if e_u is not None and c_u is not None else None) if b is not None]
+        if bounds and e + N*c >= min(bounds) - eps:
+            return c, e
+        return None
+
+    def solve_box(self, e_l, e_u, c_l, c_u):
+        '''
+        solves the MILP of one box, returns None if the box is infeasible (or no solution was found in time), else
+        {"c", "e" (unrounded), "diagram_path", "pool" (the (c, e) of the solution pool, if used), "pool_bound", "gap", "obj_bound"}
+        With a deadline the solve is cut at the deadline, what it leaves unproven is appended to self.open_boxes.
+        With a checkpoint, a box solved in an earlier run is answered from it.
+        '''
+        box, weights = (e_l, e_u, c_l, c_u), self.enc.objective_weights
+        if self.checkpoint is not None:
+            entry = self.checkpoint.lookup(box, weights)
+            if entry is not None:
+                return self.replay_solve(entry)
+        calls, infeasible_calls, open_before = self.milp_calls, self.infeasible_calls, len(self.open_boxes)
+        result = self._solve_box(*box)
+        if self.checkpoint is not None and self.milp_calls > calls:
+            open_boxes = self.open_boxes[open_before:]
+            self.checkpoint.record_solve(box, weights, result, self.infeasible_calls > infeasible_calls, open_boxes[0] if open_boxes else None, self.last_status)
+        return result
+
+    def replay_solve(self, entry):
+        '''
+        applies a "solve" entry of the checkpoint as if the box had just been solved, returns its result
+        '''
+        print(f"Replaying e_l={entry['box'][0]}, e_u={entry['box'][1]}, c_l={entry['box'][2]}, c_u={entry['box'][3]} from the checkpoint")
+        self.last_status = entry.get("status", "infeasible" if entry["infeasible"] else "optimal")
+        if entry["infeasible"]:
+            self.memo.add(tuple(entry["box"]))
+        if entry["open_box"] is not None:
+            *open_box, open_weights = entry["open_box"]
+            self.open_boxes.append((*open_box, tuple(open_weights)))
+        result = entry["result"]
+        if result is None:
+            return None
+        bound, bound_weights = result["obj_bound"]
+        return dict(result, pool=[tuple(point) for point in result["pool"]], obj_bound=(bound, tuple(bound_weights)))
+
+    def _solve_box(self, e_l, e_u, c_l, c_u):
+        weights = self.enc.objective_weights
+        if self.deadline is not None:
+            remaining = self.deadline - time.perf_counter()
+            if remaining <= 0:
+                print("Returning because the time budget is used up")
+                self.last_status = "budget"
+                self.open_boxes.append((e_l, e_u, c_l, c_u, None, weights))
+                return None
+            self.enc.model.Params.TimeLimit = remaining if self.box_time_limit is None else min(remaining, self.box_time_limit)
+        elif self.box_time_limit is not None:
+            self.enc.model.Params.TimeLimit = self.box_time_limit
         # possible_pareto_point = self.enc.solve(e_l, e_u , c_l , c_u)
-        res = self.enc.solve(e_l, e_u , c_l , c_u)
-        print("Solving done")
-        if self.enc.model.Status == GRB.INFEASIBLE:
+        if self.warm_start is not None:
+            self.warm_start.apply(e_l, e_u, c_l, c_u)
+        if self.relax_and_fix is None:
+            res = self.enc.solve(e_l, e_u , c_l , c_u)
+            status, runtime, node_count = self.enc.model.Status, self.enc.model.Runtime, int(self.enc.model.NodeCount)
+        else:
+            res = self.relax_and_fix.solve(e_l, e_u, c_l, c_u)
+            status, runtime, node_count = self.relax_and_fix.last_status, self.relax_and_fix.last_runtime, self.relax_and_fix.last_node_count
+        if self.warm_start is not None:
+            self.warm_start.record()
+            print(f"MIP start: {self.warm_start.last_kind}, accepted: {self.warm_start.last_accepted}")
+        self.milp_calls += 1
+        self.solve_time += runtime
+        self.node_count += node_count
+        self.overhead_time += self.enc.last_overhead
+        print(f"Solving done (box overhead {self.enc.last_overhead:.4f} s, solve time {runtime:.4f} s)")
+        self.last_status = {GRB.OPTIMAL: "optimal", GRB.INFEASIBLE: "infeasible"}.get(status, "time_limit")
+        if status == GRB.INFEASIBLE:
             print("Returning because the model was infeasible")
-            return
+            self.infeasible_calls += 1
+            self.memo.add((e_l, e_u, c_l, c_u))
+            return None
+        if self.enc.model.SolCount == 0:
+            print("Returning because no solution was found in time")
+            self.open_boxes.append((e_l, e_u, c_l, c_u, self.enc.model.ObjBound, weights))
+            return None
         c = self.enc.calculate_correctness()
         e = self.enc.calculate_explainability()
+        # relax and fix: the solve only bounds the fixed model, the box is bounded by its relaxation
+        obj_bound = self.enc.model.ObjBound if self.relax_and_fix is None else self.relax_and_fix.last_bound
+        obj_val = self.enc.model.ObjVal
+        # the objectives are integral (e in steps of 1, N*c in steps of one sample), a bound less than 1 above proves the point
+        proven = obj_bound - obj_val < 1.0
+        if self.relax_and_fix is None:
+            gap = 0.0 if status == GRB.OPTIMAL else self.enc.model.MIPGap
+        else:
+            gap = 0.0 if proven else (obj_bound - obj_val) / max(abs(obj_val), 1e-10)
+            if not proven and self.last_status == "optimal":
+                # the part of the box dominating the point is searched again like after a time out (see split_timed_out())
+                self.last_status = "unproven"
+        w_e, w_c = weights
+        e_bound = (obj_bound - w_c*self.enc.N_SAMPLES*c) / w_e
+        e_bound = min(e_bound, e_u) if e_u is not None else e_bound
         print("--------------------")
-        print(f"c={c}, e={e}")
-        diagram_path = None if res is None else res.get("diagram_path")  
+        print(f"c={c}, e={e}, gap={gap}, e_bound={e_bound}, proven={proven}")
+        if status != GRB.OPTIMAL or (self.relax_and_fix is not None and not proven):
+            # a better point of the box may be missed (not only one dominating this point: the enumerators
+            # search only part of the box after it), the box stays open up to the bound of the solve
+            self.open_boxes.append((e_l, e_u, c_l, c_u, obj_bound, weights))
+        return {
+            "c": c,
+            "e": e,
+            "diagram_path": None if res is None else res.get("diagram_path"),
+            "pool": self.enc.pool_points() if self.use_pool else [],
+            # PoolObjBound is a bound of e + N*c only with the default objective weights
+            "pool_bound": self.enc.model.PoolObjBound if self.use_pool and self.enc.objective_weights == (1.0, 1.0) else None,
+            "gap": gap,
+            "obj_bound": (obj_bound, weights),
+            "e_bound": max(e, e_bound),
+            "proven": proven,
+        }
+
+    def split_timed_out(self, box, result):
+        '''
+        returns the boxes a box stopped by box_time_limit (or left unproven by relax and fix) is searched again in (with pool_bound, one level deeper),
+        [] if it is flagged instead: the box has been split max_split_depth times or the time budget is used up.
+        With an incumbent (c, e) the part of the box strictly dominating it is searched again (e' > e, or e' = e and c' > c:
+        next to the children of the point this covers the whole box but the points it dominates), without one the box is cut in two halves.
+        '''
+        depth = self.box_depth.get(box[:4], 0)
+        if depth >= self.max_split_depth or (self.deadline is not None and time.perf_counter() >= self.deadline):
+            print(f"Flagging e_l={box[0]}, e_u={box[1]}, c_l={box[2]}, c_u={box[3]}: timed out")
+            self.flagged_boxes.append(box[:4])
+            return []
+        e_l, e_u, c_l, c_u = box[:4]
+        if result is not None:
+            e, c, Q = result["e"], result["c"], self.enc.C_QUANT
+            boxes = [b for b in ((e + 1, e_u, c, c_u), (e, e, c + Q, c_u)) if not is_empty(b)]
+        else:
+            boxes = self.halves(box)
+        if not boxes:
+            self.flagged_boxes.append(box[:4])
+            return []
+        # the boxes cover what the open box of the stopped solve stood for
+        for k in range(len(self.open_boxes) - 1, -1, -1):
+            if self.open_boxes[k][:4] == tuple(box[:4]):
+                del self.open_boxes[k]
+                break
+        for b in boxes:
+            self.box_depth[b] = depth + 1
+        print(f"Searching the timed-out box again in {boxes}")
+        return [(*b, box[4]) for b in boxes]
+
+    def halves(self, box):
+        '''
+        returns the box cut in two at half its c range (at half its e range if it holds a single c level), [] if it cannot be cut
+        '''
+        Q = self.enc.C_QUANT
+        e_l, e_u, c_l, c_u = box[:4]
+        c_lo = 0.0 if c_l is None else c_l
+        c_hi = 1.0 if c_u is None else c_u
+        steps = round((c_hi - c_lo) / Q)
+        if steps >= 1:
+            c_mid = c_lo + (steps // 2) * Q
+            return [(e_l, e_u, c_l, c_mid), (e_l, e_u, c_mid + Q, c_u)]
+        self.enc._build_constraints() # _e_range is known once the bound rows exist
+        e_lo = self.enc._e_range[0] if e_l is None else e_l
+        e_hi = self.enc._e_range[1] if e_u is None else e_u
+        if e_hi - e_lo < 1:
+            return []
+        e_mid = (e_lo + e_hi) // 2
+        return [(e_l, e_mid, c_l, c_u), (e_mid + 1, e_u, c_l, c_u)]
+
+    def prune_box(self, box):
+        '''
+        returns the box shrunk to the part not proven empty or dominated, None if nothing is left (see archive.tighten_box()),
+        with a bound envelope also cut to the part the relaxation allows
+        '''
+        tightened = tighten_box(box, self.archive, self.memo, self.enc.C_QUANT)
+        if tightened is not None and self.envelope is not None:
+            cut = self.envelope.tighten(tightened)
+            if cut != tightened:
+                self.envelope.cuts += 1
+                print(f"Cut by the bound envelope to {cut}")
+                # the cut part may be dominated by an archive point
+                tightened = None if cut is None else tighten_box(cut, self.archive, self.memo, self.enc.C_QUANT)
+        if tightened is None:
+            self.skipped_boxes += 1
+            print(f"Skipping e_l={box[0]}, e_u={box[1]}, c_l={box[2]}, c_u={box[3]}: empty or dominated")
+        elif tightened != box:
+            self.tightened_boxes += 1
+            print(f"Tightened to e_l={tightened[0]}, e_u={tightened[1]}, c_l={tightened[2]}, c_u={tightened[3]}")
+            # split_timed_out() looks the depth up under the box that is solved
+            if box[:4] in self.box_depth:
+                self.box_depth[tightened[:4]] = max(self.box_depth[box[:4]], self.box_depth.get(tightened[:4], 0))
+        return tightened
+
+    def record_point(self, result):
+        '''
+        records the point of a solve_box() result (and its solution pool)
+        '''
+        self.harvest_pool(result["pool"])
         print("Appending to pareto_points list")
         # c_final = round(c/self.enc.C_QUANT)*self.enc.C_QUANT
-        c_final = max(0.0, min(1.0, round(c / self.enc.C_QUANT) * self.enc.C_QUANT))
-        assert abs(c_final-c)<= 0.5 * self.enc.C_QUANT + 1e-12, f"Moving away because of the rounding too much!, by {abs(c_final-c)}"
-        e_final = round(e,self.enc.E_ROUNDING_LIMIT)
-        self.pareto_points.append([c_final, e_final, diagram_path]) 
+        c_final, e_final = self.round_point(result["c"], result["e"])
+        # on the grid of the box bounds, tighten_box() compares the points with them
+        self.archive.add(c_final, e_final)
+        self.pareto_points.append([c_final, e_final, result["diagram_path"]])
+        # a point found again (in a box searched again after a time out) keeps its best gap and bound
+        gap = min(result.get("gap", 0.0), self.point_gaps.get((c_final, e_final), float("inf")))
+        self.point_gaps[(c_final, e_final)] = gap
+        e_bound, proven = result.get("e_bound", e_final), result.get("proven", True)
+        if (c_final, e_final) in self.point_bounds:
+            old_bound, old_proven = self.point_bounds[(c_final, e_final)]
+            e_bound, proven = min(e_bound, old_bound), proven or old_proven
+        self.point_bounds[(c_final, e_final)] = (e_final if proven else e_bound, proven)
+
+    def add_point(self, e_l, e_u, c_l, c_u, pool_bound, result):
+        '''
+        records the point solved (or closed) in a box, returns the boxes still to be searched as (e_l, e_u, c_l, c_u, pool_bound)
+        '''
+        self.record_point(result)
+        if result["pool_bound"] is not None:
+            # the children are inside this box, the smallest known bound is the strongest
+            pool_bound = result["pool_bound"] if pool_bound is None else min(pool_bound, result["pool_bound"])
+        children = self.child_boxes(e_l, e_u, c_l, c_u, result["c"], result["e"])
+        if self.deadline is not None and "obj_bound" in result:
+            self.box_bounds.update((box, result["obj_bound"]) for box in children)
+        return [(*box, pool_bound) for box in children]
+
+    def close_box(self, e_l, e_u, c_l, c_u, pool_bound):
+        '''
+        if a pool candidate is optimal for the box (see closing_candidate()) records it and returns the boxes still to be searched,
+        else returns None (the box has to be solved)
+        '''
+        closing = self.closing_candidate(e_l, e_u, c_l, c_u, pool_bound) if self.use_pool else None
+        if closing is None:
+            return None
+        self.saved_calls += 1
+        c, e = closing
+        print(f"Box closed by the pool candidate c={c}, e={e}")
+        return self.add_point(e_l, e_u, c_l, c_u, pool_bound, {"c": c, "e": e, "diagram_path": None, "pool": [], "pool_bound": None})
+
+    def find_pareto_points(self, e_l, e_u , c_l , c_u, pool_bound = None):
+        '''
+        finds the Pareto points in the box, the boxes still to be searched are kept in self.queue
+        pool_bound - the solutions of the box with e + N*c above it are known candidates (see closing_candidate()), None if unknown
+        '''
+        self.queue.push((e_l, e_u, c_l, c_u, pool_bound))
+        while self.queue:
+            if self.deadline is not None and time.perf_counter() >= self.deadline:
+                # the boxes not searched in time stay open
+                self.open_boxes += [(*b[:4], *self.box_bounds.get(b[:4], (None, self.enc.objective_weights))) for b in self.queue.pending()]
+                self.queue.clear()
+                break
+            if self.queue_hook is not None:
+                self.queue_hook(self.queue)
+            e_l, e_u, c_l, c_u, pool_bound = box = self.queue.pop()
+            if (e_l is not None and e_u is not None and e_l > e_u) or (c_l is not None and c_u is not None and c_l > c_u):
+                continue
+            print("-----------------------------------------------------------------")
+            print(f"e_l={e_l}, e_u={e_u}, c_l={c_l}, c_u={c_u}")
+            print("Inside the find_pareto_points function")
+            box = self.prune_box(box)
+            if box is None:
+                continue
+            children = self.close_box(*box)
+            if children is None:
+                result = self.solve_box(*box[:4])
+                retry = self.split_timed_out(box, result) if self.last_status in ("time_limit", "unproven") else []
+                if result is None:
+                    self.queue.extend(retry)
+                    continue
+                children = self.add_point(*box, result) + retry
+            self.queue.extend(children)
+            if self.checkpoint is not None:
+                self.checkpoint.record_queued(children)
+
+    def child_boxes(self, e_l, e_u, c_l, c_u, c, e):
+        '''
+        returns the two parts of the box not dominated by and not dominating the point (c, e) found in it, as (e_l, e_u, c_l, c_u)
+        '''
+        boxes = []
         if e_u is not None and e_l is not None and e_u == e_l:
-            return
+            return boxes
         if c_u is not None and c_l is not None and c_u == c_l:
-            return
+            return boxes
         # print("Appending to pareto_points list")
         # self.pareto_points.append([c,e])
         if e_u is not None and e+1 <= e_u:
             print("Searching solutions with greater explainability")
-            self.find_pareto_points(e+1,e_u,c_l,c - 1.0/len(self.enc.S) )
+            boxes.append((e+1,e_u,c_l,c - self.enc.C_QUANT))
         else:
             if e_u is None:
                 print("Searching solutions with greater explainability with e_u None")
-                self.find_pareto_points(e+1,e_u,c_l,c- 1.0/len(self.enc.S) )
+                boxes.append((e+1,e_u,c_l,c- self.enc.C_QUANT))
         if e_l is not None and e-1 >= e_l:
             print("Searching for solutions with greater correctness")
-            self.find_pareto_points(e_l,e-1,c+ 1.0/len(self.enc.S),c_u)
+            boxes.append((e_l,e-1,c+ self.enc.C_QUANT,c_u))
         else:
             if e_l is None:
                 print("Searching for solutions with greater correctness with e_l None")
-                self.find_pareto_points(e_l,e-1,c+ 1.0/len(self.enc.S),c_u)
-            else:
-                return
+                boxes.append((e_l,e-1,c+ self.enc.C_QUANT,c_u))
+        return boxes
             
     def clean_pareto_points(self):
         #arrange the pareto points in increasing order of correctness
@@ -117,6 +479,33 @@ class Pareto_Points:
             for c, e, _ in self.pareto_points:
                 w.writerow([c, e])
 
+    def open_cap(self, c):
+        '''
+        returns the largest e an open or flagged box allows to a point with correctness >= c (None if none does, see anytime.open_box_cap())
+        '''
+        boxes = self.open_boxes + [(*box, None, self.enc.objective_weights) for box in self.flagged_boxes]
+        return max((cap for cap in (open_box_cap(box, c, self.enc) for box in boxes) if cap is not None), default=None)
+
+    def write_point_status(self):
+        '''
+        writes for every point whether it is proven, its MIP gap and its bound interval [e, e_bound] at its correctness.
+        A point optimal in its own box is not proven while an open or flagged box may hold a point dominating it.
+        '''
+        out_dir = os.path.join(self.inp.filename, "results", f"I_{self.enc.inp.max_nodes}_int_nodes_{self.enc._int_tag}", "pareto_points")
+        os.makedirs(out_dir, exist_ok=True)
+        fn = f"pareto_points_status_I{self.inp.max_nodes}_C{self.inp.c_max}.csv"
+        with open(os.path.join(out_dir, fn), "w", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(["c", "e", "proven", "mip_gap", "e_bound"])
+            for c, e, _ in self.pareto_points:
+                e_bound, proven = self.point_bounds.get((c, e), (e, True))
+                cap = self.open_cap(c)
+                if cap is not None and cap >= e - 1e-9:
+                    proven, e_bound = False, max(e_bound, cap)
+                w.writerow([c, e, proven, self.point_gaps.get((c, e), 0.0), e_bound])
+        if self.flagged_boxes:
+            print(f"{len(self.flagged_boxes)} boxes timed out and were not searched further: {self.flagged_boxes}")
+
     def plot_pareto_points(self):
         out_dir = os.path.join(self.inp.filename, "results", f"I_{self.enc.inp.max_nodes}_int_nodes_{self.enc._int_tag}", "pareto_curves")
         os.makedirs(out_dir, exist_ok=True)
@@ -131,11 +520,32 @@ class Pareto_Points:
         plt.savefig(os.path.join(out_dir, fn), dpi=300, bbox_inches="tight")
         plt.close()
 
-    def cumulate_pareto_points(self):
-        self.find_pareto_points(None, None, None, None)
+    def cumulate_pareto_points(self, method = "divide_and_conquer", time_budget = None):
+        '''
+        method - how the front is enumerated, one of enumerators.METHODS
+        time_budget - wall-clock seconds, when given the best front found in time is returned together with
+                      a certified upper bound and the hypervolume gap (see anytime.py)
+        '''
+        if self.relaxed_bound is not None and self.envelope is None:
+            self.envelope = relaxed_envelope(self.inp, self.root, self.relaxed_bound, self.relaxed_levels, self.env, **self.encoding_options)
+        if time_budget is not None:
+            self.deadline = time.perf_counter() + time_budget
+        enumerate_front(self, method)
+        print(f"{method}: {self.milp_calls} MILP calls ({self.infeasible_calls} infeasible), {self.saved_calls} boxes closed by the pool")
+        if self.relax_and_fix is not None:
+            print(f"Relax and fix: {self.relax_and_fix.solves} window solves, {self.relax_and_fix.fallbacks} boxes solved exactly")
+        if self.envelope is not None:
+            print(f"Bound envelope: {self.envelope.relaxation_calls} relaxations, {self.envelope.cuts} boxes cut")
         self.clean_pareto_points()
         self.write_pareto_points()
+        self.write_point_status()
         self.plot_pareto_points()
+        if self.envelope is not None:
+            write_envelope_report(self)
+        if time_budget is not None:
+            self.deadline = None
+            self.enc.model.Params.TimeLimit = GRB.INFINITY
+            write_anytime_report(self)
 
 # def main():
 #     start = time.perf_counter()
@@ -0,0 +1,133 @@
+import math
+import gurobipy as gp
+from gurobipy import GRB
+
+'''
+Relax and fix heuristic for the boxes of the Pareto search on large trees (Pareto_Points(..., relax_and_fix=True)).
+
+A box is solved window by window down the tree instead of with all the integral nodes at once:
+    1. only the nodes of the window (the root first) keep their integrality, the rest of the model is relaxed
+    2. the lam and tau of the window nodes are fixed (by their bounds) to the rounded values of the solution
+    3. the next window is the internal nodes the fixed tau of the window lead to, until no new node is reached
+    4. a last solve with the integrality of the Encoding gives the diagram, the nodes not reached (inactive) are integral there
+The last solution is integral and feasible for the box. The first solve is a relaxation of the box, its bound is
+the bound of the box: the gap of the point found is measured against it.
+If the fixing leaves the box without a solution, the box is solved exactly (a fallback).
+The TimeLimit of the model is the limit of the whole box: every window solve gets half of the time left, the last
+solve (and the fallback) what is left then.
+NOTE: the bounds are restored at the start of the next solve, so the solution of the last one can still be read
+'''
+
+
+class Relax_And_Fix:
+    '''
+    Instance attributes:
+        enc(Encoding) - the encoding solved, its integral nodes are the target of the heuristic
+        integrality(tuple) - (lam, tau, u, m) integral nodes of enc
+        last_bound(float) - objective bound of the box of the last solve() (from its first, relaxed, solve)
+        last_status(int) - gurobi status of the last solve(): GRB.INFEASIBLE if the relaxed box is, else the status of its last solve
+        last_runtime(float) - gurobi run time of all the solves of the last solve()
+        last_node_count(int) - branch and bound nodes of all the solves of the last solve()
+        solves(int) - number of window solves (the last solve of a box included)
+        fallbacks(int) - boxes solved exactly because the fixing left them without a solution
+    '''
+    def __init__(self, enc):
+        self.enc = enc
+        self.integrality = (set(enc.lam_int_nodes), set(enc.tau_int_nodes), set(enc.u_int_nodes), set(enc.m_int_nodes))
+        self.last_bound = None
+        self.last_status = None
+        self.last_runtime = 0.0
+        self.last_node_count = 0
+        self.solves = 0
+        self.fallbacks = 0
+        self._fixed = [] # (var, lb, ub) of the variables fixed in the last solve()
+        self._limit = GRB.INFINITY # TimeLimit of the box being solved
+
+    def _unfix(self):
+        for var, lb, ub in self._fixed:
+            var.LB, var.UB = lb, ub
+        self._fixed = []
+
+    def _fix(self, nodes):
+        '''
+        fixes lam and tau of the nodes to the rounded values of the current solution
+        '''
+        enc = self.enc
+        for block in (enc.lam, enc.tau):
+            for key, var in block.items():
+                if key[0] in nodes and isinstance(var, gp.Var):
+                    value = float(round(var.X))
+                    self._fixed.append((var, var.LB, var.UB))
+                    var.LB, var.UB = value, value
+
+    def _children(self, nodes):
+        '''
+        returns the internal nodes the fixed tau of the nodes lead to
+        '''
+        enc = self.enc
+        return {key[2] for key, var in enc.tau.items()
+                if key[0] in nodes and isinstance(key[2], int) and isinstance(var, gp.Var) and var.UB > 0.5}
+
+    def _solve(self, e_l, e_u, c_l, c_u, share=1.0):
+        '''
+        solves the box with share of the time left of the box limit (self._limit)
+        '''
+        if self._limit < GRB.INFINITY:
+            self.enc.model.Params.TimeLimit = max(0.0, self._limit - self.last_runtime) * share
+        res = self.enc.solve(e_l, e_u, c_l, c_u)
+        self.solves += 1
+        self.last_runtime += self.enc.model.Runtime
+        self.last_node_count += int(self.enc.model.NodeCount)
+        return res
+
+    def solve(self, e_l, e_u, c_l, c_u):
+        '''
+        solves the box as described above, returns what Encoding.solve() returns for the last solve
+        (the model holds its solution, self.last_bound the bound of the box)
+        '''
+        enc = self.enc
+        model = enc.model
+        self._unfix()
+        self.last_runtime = 0.0
+        self.last_node_count = 0
+        self.last_bound = math.inf
+        self._limit = model.Params.TimeLimit
+        save_diagram = enc.save_diagram
+        enc.save_diagram = False # only the diagram of the last solve is kept
+        window, fixed = {enc.root}, set()
+        try:
+            while window:
+                enc.set_integrality(*(window & nodes for nodes in self.integrality))
+                self._solve(e_l, e_u, c_l, c_u, share=0.5)
+                if not fixed:
+                    # nothing is fixed yet: a relaxation of the box
+                    if model.Status == GRB.INFEASIBLE:
+                        # the box is empty (the model loses its status when the integrality is restored)
+                        self.last_status = GRB.INFEASIBLE
+                        model.Params.TimeLimit = self._limit
+                        return {"status": GRB.INFEASIBLE, "diagram_path": None}
+                    self.last_bound = model.ObjBound if model.IsMIP else (model.ObjVal if model.Status == GRB.OPTIMAL else math.inf)
+                if model.SolCount == 0:
+                    # the fixing left the box without a solution (or the time ran out)
+                    print("Relax and fix left the box without a solution, solving it exactly")
+                    self.fallbacks += 1
+                    self._unfix()
+                    break
+                self._fix(window)
+                fixed |= window
+                window = self._children(window) - fixed
+        finally:
+            enc.set_integrality(*self.integrality)
+            enc.save_diagram = save_diagram
+        res = self._solve(e_l, e_u, c_l, c_u)
+        if model.SolCount == 0 and self._fixed:
+            print("Relax and fix left the box without a solution, solving it exactly")
+            self.fallbacks += 1
+            self._unfix()
+            res = self._solve(e_l, e_u, c_l, c_u)
+        if not self._fixed:
+            # exact solve: its own bound may be the stronger one
+            self.last_bound = min(self.last_bound, model.ObjBound)
+        self.last_status = model.Status
+        model.Params.TimeLimit = self._limit
+        return res
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the modules of milp_solver import each other by their flat names (from archive import ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
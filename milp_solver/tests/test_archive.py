@@ -0,0 +1,86 @@
+import pytest
+
+from archive import Pareto_Archive, Infeasible_Memo, tighten_box
+
+C_STEP = 0.025 # one sample of a 40-sample dataset
+
+
+def test_archive_keeps_non_dominated_points_sorted():
+    archive = Pareto_Archive()
+    assert archive.add(0.7, 8)
+    assert archive.add(0.5, 10)
+    assert archive.points == [(0.5, 10), (0.7, 8)]
+    assert archive.dominates(0.5, 9)
+    assert archive.dominates(0.7, 8) # weakly
+    assert not archive.dominates(0.8, 1)
+    assert not archive.dominates(0.4, 11)
+
+
+def test_archive_rejects_dominated_and_removes_dominated_points():
+    archive = Pareto_Archive()
+    archive.add(0.5, 10)
+    archive.add(0.7, 8)
+    assert not archive.add(0.6, 7)
+    assert not archive.add(0.7, 8)
+    assert len(archive) == 2
+    assert archive.add(0.7, 11)
+    assert archive.points == [(0.7, 11)]
+
+
+def test_archive_best_e_and_best_c():
+    archive = Pareto_Archive()
+    archive.add(0.5, 10)
+    archive.add(0.7, 8)
+    assert archive.best_e(0.6) == 8
+    assert archive.best_e(0.5) == 10
+    assert archive.best_e(0.8) is None
+    assert archive.best_c(9) == 0.5
+    assert archive.best_c(8) == 0.7
+    assert archive.best_c(11) is None
+
+
+def test_memo_covers_boxes_inside_an_empty_box():
+    memo = Infeasible_Memo()
+    memo.add((None, 5, 0.5, 0.7))
+    assert memo.covers((2, 4, 0.5, 0.6))
+    assert memo.covers((None, 5, 0.5, 0.7))
+    assert not memo.covers((2, 6, 0.5, 0.6))
+    assert not memo.covers((2, 4, 0.5, None))
+
+
+def test_memo_keeps_only_the_largest_boxes():
+    memo = Infeasible_Memo()
+    memo.add((2, 4, 0.5, 0.6, None))
+    memo.add((3, 4, 0.5, 0.6)) # inside the first one
+    assert memo.boxes == [(2, 4, 0.5, 0.6)]
+    memo.add((None, 5, 0.5, 0.7))
+    assert memo.boxes == [(None, 5, 0.5, 0.7)]
+
+
+def test_tighten_box_cuts_off_an_empty_e_side():
+    memo = Infeasible_Memo()
+    memo.add((None, 5, None, None))
+    assert tighten_box((None, 8, None, None, "pool"), Pareto_Archive(), memo, C_STEP) == (6, 8, None, None, "pool")
+
+
+def test_tighten_box_cuts_off_the_dominated_parts():
+    archive = Pareto_Archive()
+    archive.add(1.0, 7)
+    # every point with e <= 7 is dominated by (1.0, 7)
+    assert tighten_box((None, None, 0.5, None), archive, Infeasible_Memo(), C_STEP) == (8, None, 0.5, None)
+    archive = Pareto_Archive()
+    archive.add(0.6, 9)
+    # below e_u = 9 every point with c <= 0.6 is dominated by (0.6, 9)
+    e_l, e_u, c_l, c_u = tighten_box((2, 9, None, 0.8), archive, Infeasible_Memo(), C_STEP)
+    assert (e_l, e_u, c_u) == (2, 9, 0.8)
+    assert c_l == pytest.approx(0.6 + C_STEP)
+
+
+def test_tighten_box_returns_none_when_nothing_is_left():
+    memo = Infeasible_Memo()
+    memo.add((None, None, 0.5, None))
+    assert tighten_box((1, 2, 0.6, 0.7), Pareto_Archive(), memo, C_STEP) is None
+    archive = Pareto_Archive()
+    archive.add(1.0, 7)
+    assert tighten_box((None, 7, None, None), archive, Infeasible_Memo(), C_STEP) is None
+    assert tighten_box((3, 2, None, None), Pareto_Archive(), Infeasible_Memo(), C_STEP) is None
@@ -0,0 +1,46 @@
+import pytest
+
+from box_queue import Box_Queue, contains
+
+
+def test_contains_with_open_sides():
+    assert contains((None, None, None, None), (1, 2, 0.5, None))
+    assert contains((1, None, 0.5, 0.9), (2, 5, 0.5, 0.9))
+    assert not contains((1, 5, 0.5, 0.9), (2, None, 0.5, 0.9))
+    assert not contains((1, 5, 0.5, 0.9), (0, 5, 0.5, 0.9))
+
+
+def test_box_inside_a_pending_box_is_dropped():
+    queue = Box_Queue(n_samples=40)
+    assert queue.push((None, 10, 0.5, None, None))
+    assert not queue.push((2, 8, 0.6, 0.9, None))
+    assert len(queue) == 1
+    assert queue.dropped == 1
+    assert queue.pop() == (None, 10, 0.5, None, None)
+    assert not queue
+
+
+def test_pending_boxes_inside_a_new_box_are_removed():
+    queue = Box_Queue(n_samples=40)
+    queue.push((2, 8, 0.6, 0.9, None))
+    queue.push((9, 12, 0.1, 0.2, None))
+    assert queue.push((None, 10, 0.5, None, None))
+    assert len(queue) == 2
+    assert queue.dropped == 1
+    assert set(queue.pending()) == {(9, 12, 0.1, 0.2, None), (None, 10, 0.5, None, None)}
+    queue.pop()
+    queue.pop()
+    with pytest.raises(IndexError):
+        queue.pop()
+
+
+def test_depth_first_pops_the_first_child_first():
+    queue = Box_Queue("depth_first", 40)
+    queue.extend([(5, None, None, 0.5, None), (None, 3, 0.6, None, None)])
+    assert queue.pop() == (5, None, None, 0.5, None)
+    assert queue.pop() == (None, 3, 0.6, None, None)
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        Box_Queue("random")
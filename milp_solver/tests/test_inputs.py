@@ -0,0 +1,39 @@
+import os
+import shutil
+
+import pytest
+
+from inputs import Input
+
+DATASET = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples", "random_dataset")
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    '''
+    a copy of examples/random_dataset whose features.txt also has a derived feature no predicate refers to
+    '''
+    dir_name = tmp_path / "random_dataset"
+    dir_name.mkdir()
+    shutil.copy(os.path.join(DATASET, "samples.csv"), dir_name)
+    with open(os.path.join(DATASET, "features.txt")) as f:
+        features = f.read()
+    (dir_name / "features.txt").write_text("y6 = y1+y2\n" + features)
+    return str(dir_name)
+
+
+def test_chunked_input_with_an_unused_derived_feature(dataset):
+    full = Input(dataset, 2, use_cache=False)
+    chunked = Input(dataset, 2, chunksize=7)
+    assert (chunked.membership == full.membership).all()
+    assert (chunked.label_idx == full.label_idx).all()
+    # the cache hit holds only the derived columns the chunked read kept, the others are computed again
+    cached = Input(dataset, 2, chunksize=7)
+    assert (cached.membership == full.membership).all()
+    assert (cached.samples.updated_samples["y6"] == full.samples.updated_samples["y6"]).all()
+
+
+def test_chunked_and_full_runs_do_not_share_the_cache(dataset):
+    Input(dataset, 2, chunksize=7)
+    Input(dataset, 2)
+    assert len(os.listdir(os.path.join(dataset, ".cache"))) == 2
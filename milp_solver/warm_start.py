@@ -0,0 +1,134 @@
+import numpy as np
+import gurobipy as gp
+from gurobipy import GRB
+
+'''
+MIP starts for the boxes of the Pareto search.
+
+Every solution gurobi finds (the optimum and the other solutions of the pool) is kept together with its (c, e), one per
+point (the start only depends on the point) and at most MAX_SOLUTIONS of them: past that the points dominated by another
+kept one are dropped first, then the oldest ones.
+Before a box is solved, the best kept solution that lies inside the box (largest e + N*c) is given as a complete start.
+If none lies inside the box, the solution closest to it is repaired: only the lam and tau of the root are given,
+gurobi has to complete the rest of the tree within the new e/c bounds (a partial start).
+Whether gurobi used the start is read from its log lines with a MESSAGE callback.
+'''
+
+EPS = 1e-6
+MAX_SOLUTIONS = 200 # most solutions kept (a solution holds a value for every variable of the model)
+
+
+class Warm_Start:
+    '''
+    Instance attributes:
+        enc(Encoding) - the encoding whose model is warm started
+        vars(list[gp.Var]) - all the variables of the model, position = column index
+        root_cols(np.ndarray) - the columns of lam[root,.] and tau[root,.,.] (the part of a solution kept by the repair)
+        e_cols, e_coeffs, c_cols, c_coeffs(np.ndarray) - e = enc._e_constant + e_coeffs . x[e_cols], N*c = c_coeffs . x[c_cols]
+        solutions(dict) - (c, e) rounded -> [c, e, x] of the first solution seen at the point (x: values of all the variables)
+        given(dict) - number of "full" / "partial" starts that were given
+        accepted(dict) - number of "full" / "partial" starts that gave gurobi a feasible solution
+        last_kind(str) - "full", "partial" or None, the start given for the current box
+        last_accepted(bool) - whether the start of the current box was accepted
+    '''
+    def __init__(self, enc):
+        self.enc = enc
+        self.vars = None
+        self.solutions = {}
+        self.given = {"full": 0, "partial": 0}
+        self.accepted = {"full": 0, "partial": 0}
+        self.last_kind = None
+        self.last_accepted = False
+
+    def _setup(self):
+        # the model has to be built before the columns are known
+        model = self.enc.model
+        model.update()
+        self.vars = model.getVars()
+        root = self.enc.root
+        root_vars = [self.enc.lam[root, p] for p in self.enc.P] + [v for (i, c, j), v in self.enc.tau.items() if i == root]
+        self.root_cols = np.array([v.index for v in root_vars if isinstance(v, gp.Var)], dtype=np.int64)
+        e_row = model.getRow(self.enc._bound_rows["e_lower"])
+        c_row = model.getRow(self.enc._bound_rows["c_lower"])
+        self.e_cols = np.array([e_row.getVar(k).index for k in range(e_row.size())], dtype=np.int64)
+        self.e_coeffs = np.array([e_row.getCoeff(k) for k in range(e_row.size())])
+        self.c_cols = np.array([c_row.getVar(k).index for k in range(c_row.size())], dtype=np.int64)
+        self.c_coeffs = np.array([c_row.getCoeff(k) for k in range(c_row.size())])
+
+    def _point(self, x):
+        e = self.enc._e_constant + float(self.e_coeffs @ x[self.e_cols])
+        c = float(self.c_coeffs @ x[self.c_cols]) / self.enc.N_SAMPLES
+        return c, e
+
+    def record(self):
+        '''
+        keeps the solutions of the last optimize() (the whole solution pool) at the points not kept yet
+        '''
+        model = self.enc.model
+        if self.vars is None:
+            self._setup()
+        for k in range(model.SolCount):
+            model.Params.SolutionNumber = k
+            x = np.array(model.getAttr("Xn", self.vars))
+            c, e = self._point(x)
+            self.solutions.setdefault((round(c, 9), round(e, 6)), [c, e, x])
+        if len(self.solutions) > MAX_SOLUTIONS:
+            self._evict()
+
+    def _evict(self):
+        '''
+        drops the solutions whose point is dominated by another kept one, then the oldest ones, down to MAX_SOLUTIONS
+        '''
+        points = list(self.solutions)
+        for key in points:
+            if any(other != key and other[0] >= key[0] and other[1] >= key[1] for other in points):
+                del self.solutions[key]
+        for key in list(self.solutions)[:len(self.solutions) - MAX_SOLUTIONS]:
+            del self.solutions[key]
+
+    def _inside(self, c, e, e_l, e_u, c_l, c_u):
+        return ((e_l is None or e >= e_l - EPS) and (e_u is None or e <= e_u + EPS) and
+                (c_l is None or c >= c_l - EPS) and (c_u is None or c <= c_u + EPS))
+
+    def _distance(self, c, e, e_l, e_u, c_l, c_u):
+        '''
+        how far (c, e) is outside the box, c measured in samples
+        '''
+        N = self.enc.N_SAMPLES
+        d = 0.0
+        d += max(0.0, (e_l - e) if e_l is not None else 0.0) + max(0.0, (e - e_u) if e_u is not None else 0.0)
+        d += N * (max(0.0, (c_l - c) if c_l is not None else 0.0) + max(0.0, (c - c_u) if c_u is not None else 0.0))
+        return d
+
+    def apply(self, e_l, e_u, c_l, c_u):
+        '''
+        sets the Start attribute for the box (or clears it if nothing is known yet), returns the kind of start given
+        '''
+        self.last_kind = None
+        self.last_accepted = False
+        if self.vars is None:
+            if not self.enc._built:
+                return None
+            self._setup()
+        starts = np.full(len(self.vars), GRB.UNDEFINED)
+        inside = [sol for sol in self.solutions.values() if self._inside(sol[0], sol[1], e_l, e_u, c_l, c_u)]
+        if inside:
+            c, e, x = max(inside, key=lambda sol: sol[1] + self.enc.N_SAMPLES * sol[0])
+            starts = x
+            self.last_kind = "full"
+        elif self.solutions:
+            c, e, x = min(self.solutions.values(), key=lambda sol: self._distance(sol[0], sol[1], e_l, e_u, c_l, c_u))
+            starts[self.root_cols] = x[self.root_cols]
+            self.last_kind = "partial"
+        self.enc.model.setAttr("Start", self.vars, starts.tolist())
+        if self.last_kind is not None:
+            self.given[self.last_kind] += 1
+        return self.last_kind
+
+    def callback(self, model, where):
+        if where != GRB.Callback.MESSAGE or self.last_kind is None or self.last_accepted:
+            return
+        message = model.cbGet(GRB.Callback.MSG_STRING)
+        if "Loaded user MIP start" in message or "User MIP start produced solution" in message:
+            self.last_accepted = True
+            self.accepted[self.last_kind] += 1
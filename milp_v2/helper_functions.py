@@ -1,7 +1,11 @@
+import numpy as np
 import pandas as pd
 predicates = {}
 pred_id =0
 line_num = 0
+membership = None # uint8 array (|S|, |P|, c_max), filled by build_membership()
+label_idx = None # position of the label of every sample in leaf_labels
+leaf_labels = []
 # parent_dir = input('Input parent directory: ')
 parent_dir = 'examples/wine'
 df = pd.read_csv(f"{parent_dir}/samples.csv", skipinitialspace=True)
@@ -27,25 +31,31 @@ def return_max_weight():
     return 2*max_weight
 
 def func(sample_id, pred_id , bucket_id = -1):    
-    global df
-    sample = df.iloc[sample_id]
+    # reads the membership array built once by build_membership() instead of evaluating the condition per sample
     if bucket_id >=0:
-        #TODO: Why bucket_id < len(predicates[pred_id]["conditions"])
-        if bucket_id<num_buckets(pred_id) and  bucket_id < len(predicates[pred_id]["conditions"]):
-            condition = predicates[pred_id]["conditions"][bucket_id]
-            result = eval(condition,{},sample.to_dict())
-            if result == True:
-                return 1
-            else:
-                return 0
+        if bucket_id < membership.shape[2]:
+            return int(membership[sample_id, pred_id, bucket_id])
         else:
             return 0
     else:
-        if sample["label"] == pred_id:
+        if leaf_labels[label_idx[sample_id]] == pred_id:
             return 1
         else:
             return 0
 
+def build_membership():
+    """Evaluate every bucket condition once over the whole dataframe (one vectorized eval per condition)."""
+    global membership, label_idx, leaf_labels
+    c_max = max((num_buckets(p) for p in predicates), default=0)
+    membership = np.zeros((len(df), len(predicates), c_max), dtype=np.uint8)
+    for p in predicates:
+        # buckets beyond num_buckets or beyond the listed conditions stay 0
+        for c, condition in enumerate(predicates[p]["conditions"][:num_buckets(p)]):
+            result = df.eval(condition, engine="python")
+            membership[:, p, c] = np.broadcast_to(np.asarray(result, dtype=bool), (len(df),))
+    leaf_labels = pd.unique(df["label"]).tolist()
+    label_idx = pd.Index(leaf_labels).get_indexer(df["label"])
+
 def read_samples():
     global df
     features = list(df.columns[:-1])
@@ -87,6 +97,7 @@ def read_features():
         df.drop(columns=["label"], inplace=True)
         df["label"] = label_col
         df.to_csv("updated_samples.csv")
+    build_membership()
 
 
 def calculate_explainability(solution):
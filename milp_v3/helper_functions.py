@@ -1,34 +1,43 @@
+import numpy as np
 import pandas as pd
 
 predicates = {}
 pred_id =0
 line_num = 0
+membership = None # uint8 array (|S|, |P|, c_max), filled by build_membership()
+label_idx = None # position of the label of every sample in leaf_labels
+leaf_labels = []
 df = pd.read_csv("samples.csv", skipinitialspace=True)
 
 def num_buckets(pred_id):
     return int(predicates[pred_id]["num_buckets"])
 
 def func(sample_id, pred_id , bucket_id = -1):    
-    global df
-    sample = df.iloc[sample_id]
+    # reads the membership array built once by build_membership() instead of evaluating the condition per sample
     if bucket_id >=0:
-        #TODO: Why bucket_id < len(predicates[pred_id]["conditions"])
-        if bucket_id<num_buckets(pred_id) and  bucket_id < len(predicates[pred_id]["conditions"]):
-            condition = predicates[pred_id]["conditions"][bucket_id]
-            result = eval(condition,{},sample.to_dict())
-            if result == True:
-                return 1
-            else:
-                return 0
+        if bucket_id < membership.shape[2]:
+            return int(membership[sample_id, pred_id, bucket_id])
         else:
             return 0
     else:
-        #TODO: Create a special case for leaves when bucket id is -1, if the label on the sample is equal to the label corresponding to that leaf return 1 else return 0
-        if sample["label"] == pred_id:
+        if leaf_labels[label_idx[sample_id]] == pred_id:
             return 1
         else:
             return 0
 
+def build_membership():
+    """Evaluate every bucket condition once over the whole dataframe (one vectorized eval per condition)."""
+    global membership, label_idx, leaf_labels
+    c_max = max((num_buckets(p) for p in predicates), default=0)
+    membership = np.zeros((len(df), len(predicates), c_max), dtype=np.uint8)
+    for p in predicates:
+        # buckets beyond num_buckets or beyond the listed conditions stay 0
+        for c, condition in enumerate(predicates[p]["conditions"][:num_buckets(p)]):
+            result = df.eval(condition, engine="python")
+            membership[:, p, c] = np.broadcast_to(np.asarray(result, dtype=bool), (len(df),))
+    leaf_labels = pd.unique(df["label"]).tolist()
+    label_idx = pd.Index(leaf_labels).get_indexer(df["label"])
+
 def read_samples():
     global df
     features = list(df.columns[:-1])
@@ -69,6 +78,7 @@ def read_features():
         df.drop(columns=["label"], inplace=True)
         df["label"] = label_col
         df.to_csv("updated_samples.csv")
+    build_membership()
 
 def main():
     read_features()